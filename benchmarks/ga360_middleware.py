@@ -0,0 +1,65 @@
+"""
+Per-response overhead of GA360Middleware, before and after the static
+payload was precomputed per language.
+
+    ENV_FILES='test,dev' python -m benchmarks.ga360_middleware
+
+"""
+
+import os
+import timeit
+
+import django
+
+
+def build_payload_per_response(request, response):
+    # GA360Middleware.process_template_response before the static payload
+    # was precomputed
+    from django.conf import settings
+    from django.utils import translation
+
+    ga360_payload = {
+        'page_id': '',
+        'business_unit': settings.GA360_BUSINESS_UNIT,
+        'site_language': translation.get_language(),
+        'site_section': settings.GA360_SITE_SECTION,
+        'site_subsection': '',
+    }
+
+    if request.user.is_authenticated:
+        ga360_payload['user_id'] = str(request.user.hashed_uuid)
+        ga360_payload['login_status'] = True
+    else:
+        ga360_payload['user_id'] = None
+        ga360_payload['login_status'] = False
+
+    response.context_data = response.context_data or {}
+    response.context_data['ga360'] = ga360_payload
+    return response
+
+
+def main(number=100000):
+    from django.contrib.auth import get_user_model
+    from django.template.response import TemplateResponse
+    from django.test import RequestFactory
+
+    from core.middleware import GA360Middleware
+
+    request = RequestFactory().get('/')
+    request.user = get_user_model()(id=1, hashed_uuid='987')
+    response = TemplateResponse(request, 'core/base.html')
+    middleware = GA360Middleware(get_response=lambda request: response)
+
+    cases = [
+        ('before', lambda: build_payload_per_response(request, response)),
+        ('after', lambda: middleware.process_template_response(request, response)),
+    ]
+    for name, case in cases:
+        seconds = min(timeit.repeat(case, number=number, repeat=5))
+        print(f'{name:<8} {seconds / number * 1e6:.3f} µs per response')
+
+
+if __name__ == '__main__':
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'conf.settings')
+    django.setup()
+    main()
@@ -0,0 +1,263 @@
+"""
+Requests per second, latency percentiles and memory allocated per request
+for every named route, driven through the full middleware stack. The
+upstreams are served by the fake_upstream stand-in at realistic latencies,
+in a process of its own so it does not compete for the GIL.
+
+    ENV_FILES='test,dev' python -m benchmarks.routes
+    ENV_FILES='test,dev' python -m benchmarks.routes --routes verify-company-hub pingdom
+    ENV_FILES='test,dev' python -m benchmarks.routes --save-baseline
+
+Each run is compared with the stored baseline, and exits with status 1 if a
+route answers with a different status code, e.g., a fast 500, or its p50,
+p99 or allocations grew by more than --tolerance, ignoring changes small
+enough to be noise. Allocations are the tracemalloc peak during the
+request, measured in a separate pass so tracing does not slow the timed
+requests.
+
+"""
+
+import argparse
+from collections import namedtuple
+import json
+import logging
+import math
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import django
+
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'routes-baseline.json')
+
+# roughly the medians and spread seen from the real upstreams
+UPSTREAM_LATENCY = {
+    'directory-api': 'lognormal:30:0.3',
+    'sso': 'lognormal:15:0.3',
+    'companies-house': 'lognormal:120:0.4',
+}
+
+# metrics where higher is worse, compared with the baseline, and the growth
+# below which a change is treated as noise however large it is relatively
+COMPARED_METRICS = {'p50_ms': 1, 'p99_ms': 5, 'peak_alloc_kib': 1}
+
+Route = namedtuple('Route', ['name', 'method', 'url', 'session_id', 'data'])
+
+
+def start_fake_upstream(seed):
+    from core import fake_upstream
+
+    config = fake_upstream.FakeUpstreamConfig(
+        latency={
+            service: fake_upstream.parse_latency(spec, rng=random.Random(seed))
+            for service, spec in UPSTREAM_LATENCY.items()
+        },
+        csv_dump_size=5 * 1024 * 1024,
+    )
+    server = fake_upstream.FakeUpstreamServer(('127.0.0.1', 0), config)
+    process = multiprocessing.get_context('fork').Process(target=server.serve_forever, daemon=True)
+    process.start()
+    # the child serves on the socket it inherited
+    server.socket.close()
+    return server.get_base_urls(), process
+
+
+def get_routes():
+    from django.conf import settings
+    from django.urls import reverse
+
+    owner = 'benchmark'
+    unverified = 'unverified-benchmark'
+    return [
+        Route('verify-company-hub', 'get', reverse('verify-company-hub'), unverified, None),
+        Route('verify-company-address', 'get', reverse('verify-company-address'), unverified, None),
+        Route('verify-company-address (submit)', 'post', reverse('verify-company-address'), unverified, {
+            'send_verification_letter_view-current_step': 'address',
+            'address-postal_full_name': 'Jeremy',
+            'address-address_confirmed': 'on',
+        }),
+        Route('verify-company-address-confirm', 'get', reverse('verify-company-address-confirm'), unverified, None),
+        Route(
+            'verify-company-address-confirm (submit)', 'post', reverse('verify-company-address-confirm'), unverified,
+            {'company_address_verification_view-current_step': 'address', 'address-code': '123456789012'},
+        ),
+        Route('verify-companies-house', 'get', reverse('verify-companies-house'), unverified, None),
+        Route(
+            'verify-companies-house-callback', 'get', reverse('verify-companies-house-callback'), unverified,
+            {'code': 'fake-oauth2-code'},
+        ),
+        Route(
+            'verify-company-address-historic-url', 'get', reverse('verify-company-address-historic-url'), None, None
+        ),
+        Route('unsubscribe', 'get', reverse('unsubscribe'), owner, None),
+        Route('unsubscribe (submit)', 'post', reverse('unsubscribe'), owner, {}),
+        Route('buyers-csv-dump', 'get', reverse('buyers-csv-dump'), None, {'token': 'debug'}),
+        Route('suppliers-csv-dump', 'get', reverse('suppliers-csv-dump'), None, {'token': 'debug'}),
+        Route('company-detail', 'get', reverse('company-detail'), None, None),
+        Route('company-case-study-create', 'get', reverse('company-case-study-create'), None, None),
+        Route('register', 'get', reverse('register'), None, None),
+        Route('robots', 'get', reverse('robots'), None, None),
+        Route('sitemap', 'get', reverse('sitemap'), None, None),
+        Route('pingdom', 'get', reverse('pingdom'), None, None),
+        Route(
+            'healthcheck', 'get', reverse('healthcheck:healthcheck'), None,
+            {'token': settings.DIRECTORY_HEALTHCHECK_TOKEN},
+        ),
+        Route('metrics', 'get', reverse('metrics'), None, {'token': settings.METRICS_TOKEN}),
+    ]
+
+
+def build_client(session_id):
+    from django.conf import settings
+    from django.test import Client
+
+    client = Client()
+    if session_id:
+        client.cookies[settings.SSO_SESSION_COOKIE] = session_id
+    return client
+
+
+def make_request(client, route):
+    response = getattr(client, route.method)(route.url, route.data)
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    else:
+        response.content
+    response.close()
+    return response.status_code
+
+
+def get_percentile(values, percentile):
+    ordered = sorted(values)
+    return ordered[max(math.ceil(percentile / 100 * len(ordered)) - 1, 0)]
+
+
+def measure(route, number, warmup=3, traced=10):
+    client = build_client(route.session_id)
+    for _ in range(warmup):
+        status_code = make_request(client, route)
+
+    durations = []
+    for _ in range(number):
+        start_time = time.perf_counter()
+        make_request(client, route)
+        durations.append(time.perf_counter() - start_time)
+
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(min(traced, number)):
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            make_request(client, route)
+            peaks.append(tracemalloc.get_traced_memory()[1] - current)
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'status_code': status_code,
+        'requests_per_second': number / sum(durations),
+        'p50_ms': get_percentile(durations, 50) * 1000,
+        'p99_ms': get_percentile(durations, 99) * 1000,
+        'peak_alloc_kib': get_percentile(peaks, 50) / 1024,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    @returns dict - for each route, the compared metrics that grew by more
+                    than `tolerance`, e.g., {'pingdom': ['p99_ms']}, and
+                    'status_code' if the status code changed
+
+    """
+
+    regressions = {}
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        regressed = [
+            metric for metric, noise in COMPARED_METRICS.items()
+            if result[metric] > baseline[name][metric] * (1 + tolerance)
+            and result[metric] - baseline[name][metric] > noise
+        ]
+        # a route that starts failing or redirecting is usually faster
+        if result['status_code'] != baseline[name]['status_code']:
+            regressed.insert(0, 'status_code')
+        if regressed:
+            regressions[name] = regressed
+    return regressions
+
+
+def format_change(value, baseline_value):
+    if not baseline_value:
+        return ''
+    return f'{(value - baseline_value) / baseline_value:+.0%}'
+
+
+def report(results, baseline, regressions):
+    header = f'{"route":<42} {"status":>6} {"req/s":>8} {"p50 ms":>14} {"p99 ms":>14} {"alloc KiB":>14}'
+    print(header)
+    print('-' * len(header))
+    for name, result in results.items():
+        previous = baseline.get(name, {})
+        columns = [
+            f'{result[metric]:.1f} {format_change(result[metric], previous.get(metric)):>5}'
+            for metric in COMPARED_METRICS
+        ]
+        marker = ' <- ' + ', '.join(regressions[name]) if name in regressions else ''
+        print(
+            f'{name:<42} {result["status_code"]:>6} {result["requests_per_second"]:>8.1f} '
+            f'{columns[0]:>14} {columns[1]:>14} {columns[2]:>14}{marker}'
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=50, help='Timed requests per route')
+    parser.add_argument('--routes', nargs='*', help='Only benchmark these routes')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help='Store the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed growth over the baseline')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    # the fake is forked before django is set up, and the settings then read
+    # its urls from the environment
+    base_urls, upstream = start_fake_upstream(seed=args.seed)
+    os.environ.update(base_urls)
+    os.environ.setdefault('CSV_DUMP_SNAPSHOT_DIR', tempfile.mkdtemp(prefix='benchmark-csv-dump-snapshots'))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'conf.settings')
+    django.setup()
+    # debug logging of every upstream call would dominate the timings
+    logging.disable(logging.DEBUG)
+
+    routes = [route for route in get_routes() if not args.routes or route.name in args.routes]
+    try:
+        results = {route.name: measure(route, number=args.requests) for route in routes}
+    finally:
+        upstream.terminate()
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    regressions = compare(results, baseline, tolerance=args.tolerance)
+    report(results, baseline, regressions)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({**baseline, **results}, f, indent=4, sort_keys=True)
+            f.write('\n')
+        print(f'Saved baseline to {args.baseline}')
+    elif regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
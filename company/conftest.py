@@ -7,6 +7,12 @@ import requests
 import pytest
 
 
+@pytest.fixture(autouse=True)
+def csv_dump_snapshot_dir(settings, tmp_path):
+    settings.CSV_DUMP_SNAPSHOT_DIR = str(tmp_path / 'csv-dump-snapshots')
+    return settings.CSV_DUMP_SNAPSHOT_DIR
+
+
 @pytest.fixture
 def retrieve_supplier_profile_data():
     return {
@@ -1,5 +1,6 @@
 from directory_validators.string import no_html
 from directory_components.forms import BooleanField
+import requests
 
 from django import forms
 from django.utils.functional import cached_property
@@ -83,6 +84,7 @@ class CompanyCodeVerificationForm(AutoFocusFieldMixin,
 
 class CompaniesHouseOauth2Form(forms.Form):
     MESSAGE_INVALID_CODE = 'Invalid code.'
+    MESSAGE_UNAVAILABLE = 'Companies House is unavailable.'
 
     code = forms.CharField(max_length=1000)
 
@@ -98,7 +100,12 @@ class CompaniesHouseOauth2Form(forms.Form):
         )
 
     def clean_code(self):
-        if not self.oauth2_response.ok:
+        try:
+            response = self.oauth2_response
+        except requests.RequestException:
+            # timed out, or its circuit breaker is open
+            raise forms.ValidationError(self.MESSAGE_UNAVAILABLE, code='unavailable')
+        if not response.ok:
             raise forms.ValidationError(self.MESSAGE_INVALID_CODE)
         return self.cleaned_data['code']
 
@@ -1,4 +1,21 @@
+import contextlib
+import glob
+import hashlib
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from directory_api_client import buyer, supplier
 from directory_api_client.client import api_client
+import requests
+
+from core.instrumentation import record_outbound_call, register_outbound_method, validator_timings
+
+
+logger = logging.getLogger(__name__)
 
 
 def get_company_profile(sso_session_id):
@@ -7,17 +24,101 @@ def get_company_profile(sso_session_id):
     return response.json()
 
 
+def stream_get(client, url, params=None):
+    """
+    Signed GET against directory-api that does not read the body up front.
+
+    directory-api-client always downloads the whole body before returning.
+    This builds the same signed request but leaves the body on the socket, so
+    it can be relayed in chunks with `response.iter_content`. The caller must
+    close the response.
+
+    @param {AbstractAPIClient} client - e.g., `api_client.buyer`
+    @param {str} url - path relative to the client's base url
+    @param {dict} params - query string parameters
+    @returns requests.Response
+
+    """
+
+    prepared_request = requests.Request(
+        method='GET',
+        url=client.build_url(client.base_url, url),
+        params=params,
+        headers={'User-agent': f'EXPORT-DIRECTORY-API-CLIENT/{client.version}'},
+    ).prepare()
+    signed_request = client.sign_request(prepared_request=prepared_request)
+    return requests.Session().send(signed_request, timeout=client.timeout, stream=True)
+
+
+@record_outbound_call('directory-api', 'buyer.get_csv_dump')
+def get_buyer_csv_dump(token):
+    return stream_get(api_client.buyer, buyer.url_csv_dump, params={'token': token})
+
+
+@record_outbound_call('directory-api', 'supplier.get_csv_dump')
+def get_supplier_csv_dump(token):
+    return stream_get(api_client.supplier, supplier.url_csv_dump, params={'token': token})
+
+
+register_outbound_method(sys.modules[__name__], 'get_buyer_csv_dump', 'directory-api', 'buyer.get_csv_dump')
+register_outbound_method(sys.modules[__name__], 'get_supplier_csv_dump', 'directory-api', 'supplier.get_csv_dump')
+
+
+def iter_response_content(response, chunk_size):
+    try:
+        yield from response.iter_content(chunk_size=chunk_size)
+    finally:
+        response.close()
+
+
+def validator_cost(cost, remote=False, name=None):
+    """
+    Tag a validator with how expensive it is to run, so
+    halt_validation_on_failure can run the cheap ones first. Untagged
+    validators, e.g., django's built-in ones, are local with a cost of 1.
+
+    @param {int} cost - relative cost among validators of the same kind
+    @param {bool} remote - whether the validator calls an upstream service
+
+    """
+
+    def decorator(validator):
+        validator.validation_cost = cost
+        validator.validation_remote = remote
+        validator.validation_name = name or validator.__name__
+        return validator
+    return decorator
+
+
+def get_validator_cost(validator):
+    return (getattr(validator, 'validation_remote', False), getattr(validator, 'validation_cost', 1))
+
+
+def get_validator_name(validator):
+    return getattr(validator, 'validation_name', None) or type(validator).__name__
+
+
 def halt_validation_on_failure(*all_validators):
     """
     Django runs all validators on a field and shows all errors. Sometimes this
     is undesirable: we may want the validators to stop on the first error.
 
+    Local validators run before remote ones, cheapest first, so a value that
+    fails a local check never reaches an upstream service. The time each
+    validator takes is recorded.
+
     """
 
+    ordered_validators = sorted(all_validators, key=get_validator_cost)
+
     def inner(value):
-        for validator in all_validators:
-            validator(value)
-    inner.inner_validators = all_validators
+        for validator in ordered_validators:
+            start_time = time.perf_counter()
+            try:
+                validator(value)
+            finally:
+                validator_timings.observe((get_validator_name(validator),), time.perf_counter() - start_time)
+    inner.inner_validators = ordered_validators
     return [inner]
 
 
@@ -36,3 +137,111 @@ def build_company_address(company_profile):
         if value:
             address_parts.append(value)
     return ', '.join(address_parts)
+
+
+class CSVDumpSnapshot:
+    """
+    Copy of a CSV dump kept on local disk, so repeat pulls of the same dump
+    can be answered without going back to directory-api.
+
+    Snapshots are keyed by the dump name and the token used to pull them, so
+    a snapshot is only ever served to a caller that presented that token.
+    The body is stored under its own sha256 digest, which is also the ETag.
+
+    """
+
+    def __init__(self, directory, name, token):
+        self.directory = directory
+        key = hashlib.sha256(f'{name}:{token}'.encode()).hexdigest()
+        self.metadata_path = os.path.join(directory, f'{key}.json')
+        self.key = key
+
+    def get_data_path(self, digest):
+        return os.path.join(self.directory, f'{self.key}.{digest}.csv')
+
+    @property
+    def metadata(self):
+        try:
+            with open(self.metadata_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def get_fresh_metadata(self, max_age):
+        metadata = self.metadata
+        if metadata and time.time() - metadata['created'] < max_age:
+            return metadata
+
+    def open(self, metadata):
+        try:
+            return open(self.get_data_path(metadata['digest']), 'rb')
+        except FileNotFoundError:
+            # replaced by a newer snapshot since the metadata was read
+            return None
+
+    def create_temp_file(self):
+        """
+        @returns file - new temporary file in the snapshot directory, or None
+        if the directory cannot be written to
+
+        """
+
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            return tempfile.NamedTemporaryFile(dir=self.directory, delete=False)
+        except OSError:
+            logger.exception('Cannot write CSV dump snapshots to %s', self.directory)
+            return None
+
+    def save(self, temp_file, chunks, content_type, content_disposition):
+        """
+        Copy every chunk to `temp_file`, then publish it as the snapshot. An
+        interrupted transfer never leaves a partial snapshot behind.
+
+        @returns dict - metadata of the new snapshot, or None if it could not
+        be written, e.g., as the disk is full. `chunks` may then have been
+        partly consumed.
+
+        """
+
+        digest = hashlib.sha256()
+        try:
+            with temp_file:
+                for chunk in chunks:
+                    temp_file.write(chunk)
+                    digest.update(chunk)
+            metadata = {
+                'digest': digest.hexdigest(),
+                'created': time.time(),
+                'content_type': content_type,
+                'content_disposition': content_disposition,
+            }
+            self.publish(temp_path=temp_file.name, metadata=metadata)
+        except requests.RequestException:
+            # reading the upstream response failed, not writing the snapshot
+            self.discard(temp_file.name)
+            raise
+        except OSError:
+            logger.exception('Cannot write CSV dump snapshot to %s', self.directory)
+            self.discard(temp_file.name)
+            return None
+        except BaseException:
+            self.discard(temp_file.name)
+            raise
+        return metadata
+
+    @staticmethod
+    def discard(temp_path):
+        with contextlib.suppress(OSError):
+            os.unlink(temp_path)
+
+    def publish(self, temp_path, metadata):
+        data_path = self.get_data_path(metadata['digest'])
+        os.replace(temp_path, data_path)
+        with tempfile.NamedTemporaryFile('w', dir=self.directory, delete=False) as f:
+            json.dump(metadata, f)
+        os.replace(f.name, self.metadata_path)
+        # readers that already opened an older snapshot keep their handle
+        for path in glob.glob(os.path.join(self.directory, f'{self.key}.*.csv')):
+            if path != data_path:
+                os.unlink(path)
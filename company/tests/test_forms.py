@@ -1,5 +1,7 @@
 from unittest.mock import Mock, patch
 
+import pytest
+
 from django.forms.fields import Field
 from django.core.validators import URLValidator
 
@@ -77,3 +79,12 @@ def test_company_address_verification_with_leading_zeros(mock_verify_with_code):
 
     assert form.is_valid() is True
     assert form.cleaned_data['code'] == '011111111111'
+
+
+@pytest.mark.parametrize('code', ('1' * 11, '1' * 13))
+@patch('company.validators.api_client.company.verify_with_code')
+def test_company_address_verification_malformed_code_not_sent_upstream(mock_verify_with_code, code):
+    form = forms.CompanyCodeVerificationForm(sso_session_id=1, data={'code': code})
+
+    assert form.is_valid() is False
+    assert mock_verify_with_code.call_count == 0
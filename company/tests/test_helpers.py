@@ -1,4 +1,10 @@
+import pytest
+
+from django.core.exceptions import ValidationError
+from django.core.validators import MaxLengthValidator
+
 from company import helpers
+from core import instrumentation
 
 
 def test_build_company_address():
@@ -14,3 +20,39 @@ def test_build_company_address():
     assert helpers.build_company_address(company_profile) == (
         '123 fake street, London, UK, E14 9OX'
     )
+
+
+def test_halt_validation_on_failure_runs_local_validators_first():
+    calls = []
+
+    @helpers.validator_cost(100, remote=True)
+    def remote(value):
+        calls.append('remote')
+
+    @helpers.validator_cost(5)
+    def expensive(value):
+        calls.append('expensive')
+
+    def cheap(value):
+        calls.append('cheap')
+        raise ValidationError('invalid')
+
+    validator, = helpers.halt_validation_on_failure(remote, expensive, cheap)
+
+    with pytest.raises(ValidationError):
+        validator('value')
+
+    assert calls == ['cheap']
+    assert validator.inner_validators == [cheap, expensive, remote]
+
+
+def test_halt_validation_on_failure_records_timings():
+    instrumentation.validator_timings.reset()
+    validator, = helpers.halt_validation_on_failure(
+        helpers.validator_cost(100, remote=True, name='verify')(lambda value: None),
+        MaxLengthValidator(12),
+    )
+
+    validator('value')
+
+    assert set(instrumentation.validator_timings.snapshot()) == {('verify',), ('MaxLengthValidator',)}
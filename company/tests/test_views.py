@@ -1,4 +1,6 @@
 import http
+import os
+import tracemalloc
 from unittest.mock import call, patch, Mock
 import urllib
 
@@ -7,10 +9,14 @@ from directory_api_client.client import api_client
 import requests
 import pytest
 
+from django.core.cache import cache
+from django.http import QueryDict
 from django.urls import reverse
+from django.utils.datastructures import MultiValueDict
 
-from company import forms, views, validators
+from company import forms, helpers, views, validators
 from core.tests.helpers import create_response
+from enrolment import transport
 
 
 @pytest.fixture
@@ -333,6 +339,26 @@ def test_companies_house_callback_error(
     )
 
 
+@pytest.mark.parametrize('error', (transport.CircuitBreakerOpen(), requests.exceptions.ReadTimeout()))
+@patch.object(forms.CompaniesHouseClient, 'verify_oauth2_code')
+def test_companies_house_callback_unavailable(
+    mock_verify_oauth2_code, error, client, user, retrieve_profile_data
+):
+    retrieve_profile_data['is_verified'] = False
+    user.company = retrieve_profile_data
+    client.force_login(user)
+
+    mock_verify_oauth2_code.side_effect = error
+
+    url = reverse('verify-companies-house-callback')
+    response = client.get(url, {'code': '111111111111'})
+
+    assert response.status_code == 200
+    assert response.template_name == (
+        views.CompaniesHouseOauth2CallbackView.error_template
+    )
+
+
 @patch.object(forms.CompaniesHouseClient, 'verify_oauth2_code')
 def test_companies_house_callback_invalid_code(
     mock_verify_oauth2_code, settings, client, user, retrieve_profile_data
@@ -412,6 +438,43 @@ def test_verify_company_address_end_to_end(
         data={'postal_full_name': 'Jeremy'},
         sso_session_id='123'
     )
+    # the sent page follows a submission of the postal name and address
+    assert response['Cache-Control'] == 'private, no-store, no-cache, must-revalidate'
+
+
+@patch('sso.models.SSOUser.invalidate_company')
+@patch.object(api_client.company, 'profile_update')
+def test_verify_company_address_end_to_end_invalidates_company(
+    mock_profile_update, mock_invalidate_company,
+    send_verification_letter_end_to_end, retrieve_profile_data
+):
+    retrieve_profile_data['is_verified'] = False
+    mock_profile_update.return_value = create_response(200)
+
+    send_verification_letter_end_to_end()
+
+    assert mock_invalidate_company.call_count == 1
+
+
+@patch('sso.models.SSOUser.invalidate_company')
+@patch.object(forms.CompaniesHouseClient, 'verify_oauth2_code')
+@patch.object(
+    api_client.company, 'verify_with_companies_house',
+    return_value=create_response(200)
+)
+def test_companies_house_callback_invalidates_company(
+    mock_verify_with_companies_house, mock_verify_oauth2_code,
+    mock_invalidate_company, client, user, retrieve_profile_data
+):
+    retrieve_profile_data['is_verified'] = False
+    client.force_login(user)
+    mock_verify_oauth2_code.return_value = create_response(
+        status_code=200, json_body={'access_token': 'abc'}
+    )
+
+    client.get(reverse('verify-companies-house-callback'), {'code': '1'})
+
+    assert mock_invalidate_company.call_count == 1
 
 
 def test_company_address_verification_backwards_compatible_feature_flag_on(
@@ -440,39 +503,416 @@ def test_buyer_csv_dump_no_token(client):
     assert response.content == b'Token not provided'
 
 
-@patch('company.views.api_client')
-def test_buyer_csv_dump(mocked_api_client, client):
-    mocked_api_client.buyer.get_csv_dump.return_value = Mock(
-        content='abc',
-        headers={
-            'Content-Type': 'foo',
-            'Content-Disposition': 'bar'
-        }
+def test_buyer_csv_dump(client, requests_mock):
+    requests_mock.get(
+        'http://api.trade.great:8000/buyer/csv-dump/?token=debug',
+        content=b'abc',
+        headers={'Content-Type': 'foo', 'Content-Disposition': 'bar'},
     )
     url = reverse('buyers-csv-dump')
     response = client.get(url+'?token=debug')
-    assert mocked_api_client.buyer.get_csv_dump.called is True
-    assert mocked_api_client.buyer.get_csv_dump.called_once_with(token='debug')
-    assert response.content == b'abc'
+
+    assert requests_mock.call_count == 1
+    assert 'X-Signature' in requests_mock.last_request.headers
+    assert response.streaming is True
+    assert b''.join(response.streaming_content) == b'abc'
     assert response.headers['Content-Type'] == ('foo')
     assert response.headers['Content-Disposition'] == ('bar')
 
 
-@patch('company.views.api_client')
-def test_supplier_csv_dump(mocked_api_client, client):
-    mocked_api_client.supplier.get_csv_dump.return_value = Mock(
-        content='abc',
-        headers={
-            'Content-Type': 'foo',
-            'Content-Disposition': 'bar'
-        }
+def test_supplier_csv_dump(client, requests_mock):
+    requests_mock.get(
+        'http://api.trade.great:8000/supplier/csv-dump/?token=debug',
+        content=b'abc',
+        headers={'Content-Type': 'foo', 'Content-Disposition': 'bar'},
     )
     url = reverse('suppliers-csv-dump')
     response = client.get(url+'?token=debug')
-    assert mocked_api_client.supplier.get_csv_dump.called is True
-    assert mocked_api_client.supplier.get_csv_dump.called_once_with(
-        token='debug'
-    )
-    assert response.content == b'abc'
+
+    assert requests_mock.call_count == 1
+    assert response.streaming is True
+    assert b''.join(response.streaming_content) == b'abc'
     assert response.headers['Content-Type'] == ('foo')
     assert response.headers['Content-Disposition'] == ('bar')
+
+
+@pytest.mark.parametrize('view_class', (views.BuyerCSVDumpView, views.SupplierCSVDumpView))
+def test_csv_dump_peak_memory_flat(view_class, rf):
+    chunk = b'1' * views.CSVDumpGenericView.chunk_size
+
+    def peak_memory(chunk_count):
+        upstream = Mock(status_code=200, headers={'Content-Type': 'text/csv', 'Content-Disposition': 'bar'})
+        upstream.iter_content.return_value = (chunk for _ in range(chunk_count))
+        tracemalloc.start()
+        with patch.object(view_class, 'get_file', return_value=upstream):
+            response = view_class.as_view()(rf.get('/', {'token': str(chunk_count)}))
+            size = sum(len(item) for item in response.streaming_content)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        assert size == len(chunk) * chunk_count
+        assert upstream.close.call_count == 1
+        return peak
+
+    small = peak_memory(chunk_count=16)
+    large = peak_memory(chunk_count=1024)
+
+    # 64 times more data must not need meaningfully more memory
+    assert large < small * 1.5
+
+
+@pytest.fixture
+def csv_dump_upstream(requests_mock):
+    return requests_mock.get(
+        'http://api.trade.great:8000/supplier/csv-dump/',
+        content=b'abc',
+        headers={'Content-Type': 'text/csv', 'Content-Disposition': 'bar'},
+    )
+
+
+def test_csv_dump_snapshot_served_to_repeat_pulls(client, csv_dump_upstream):
+    url = reverse('suppliers-csv-dump')
+
+    first = client.get(url, {'token': 'debug'})
+    assert b''.join(first.streaming_content) == b'abc'
+    second = client.get(url, {'token': 'debug'})
+
+    assert csv_dump_upstream.call_count == 1
+    assert b''.join(second.streaming_content) == b'abc'
+    assert second['ETag'] == '"ba7816bf8f01cfea414140de5dae2223b00361a396177a9cb410ff61f20015ad"'
+    assert second['Last-Modified']
+    assert second['Content-Type'] == 'text/csv'
+    assert second['Content-Disposition'] == 'bar'
+
+
+def test_csv_dump_snapshot_not_modified(client, csv_dump_upstream):
+    url = reverse('suppliers-csv-dump')
+    first = client.get(url, {'token': 'debug'})
+    etag = first['ETag']
+
+    response = client.get(url, {'token': 'debug'}, HTTP_IF_NONE_MATCH=etag)
+
+    # kept by the client so it can revalidate
+    assert first['Cache-Control'] == 'private, no-cache'
+    assert response.status_code == 304
+    assert response['ETag'] == etag
+    assert csv_dump_upstream.call_count == 1
+
+
+def test_csv_dump_snapshot_stale(client, csv_dump_upstream, settings):
+    settings.CSV_DUMP_SNAPSHOT_MAX_AGE = 0
+    url = reverse('suppliers-csv-dump')
+
+    b''.join(client.get(url, {'token': 'debug'}).streaming_content)
+    b''.join(client.get(url, {'token': 'debug'}).streaming_content)
+
+    assert csv_dump_upstream.call_count == 2
+
+
+def test_csv_dump_snapshot_stale_not_modified(client, csv_dump_upstream, settings):
+    settings.CSV_DUMP_SNAPSHOT_MAX_AGE = 0
+    url = reverse('suppliers-csv-dump')
+    etag = client.get(url, {'token': 'debug'})['ETag']
+
+    response = client.get(url, {'token': 'debug'}, HTTP_IF_NONE_MATCH=etag)
+
+    assert response.status_code == 304
+    assert response['ETag'] == etag
+    assert csv_dump_upstream.call_count == 2
+
+
+def test_csv_dump_snapshot_keyed_by_token(client, csv_dump_upstream):
+    url = reverse('suppliers-csv-dump')
+
+    b''.join(client.get(url, {'token': 'debug'}).streaming_content)
+    b''.join(client.get(url, {'token': 'other'}).streaming_content)
+
+    assert csv_dump_upstream.call_count == 2
+
+
+def test_csv_dump_snapshot_not_written_for_error(client, requests_mock):
+    upstream = requests_mock.get(
+        'http://api.trade.great:8000/supplier/csv-dump/',
+        status_code=403,
+        content=b'invalid token',
+        headers={'Content-Type': 'text/plain', 'Content-Disposition': 'bar'},
+    )
+    url = reverse('suppliers-csv-dump')
+
+    b''.join(client.get(url, {'token': 'debug'}).streaming_content)
+    b''.join(client.get(url, {'token': 'debug'}).streaming_content)
+
+    assert upstream.call_count == 2
+
+
+def test_csv_dump_snapshot_not_written_when_interrupted(rf, csv_dump_snapshot_dir):
+    def iter_content(chunk_size):
+        yield b'abc'
+        raise requests.exceptions.ChunkedEncodingError()
+
+    upstream = Mock(status_code=200, headers={'Content-Type': 'text/csv', 'Content-Disposition': 'bar'})
+    upstream.iter_content.side_effect = iter_content
+
+    with patch.object(views.SupplierCSVDumpView, 'get_file', return_value=upstream):
+        with pytest.raises(requests.exceptions.ChunkedEncodingError):
+            views.SupplierCSVDumpView.as_view()(rf.get('/', {'token': 'debug'}))
+
+    assert os.listdir(csv_dump_snapshot_dir) == []
+    assert upstream.close.call_count == 1
+
+
+def test_csv_dump_snapshot_directory_not_writable(client, csv_dump_upstream, settings, caplog):
+    settings.CSV_DUMP_SNAPSHOT_DIR = '/proc/nope/csv'
+
+    response = client.get(reverse('suppliers-csv-dump'), {'token': 'debug'})
+
+    assert response.status_code == 200
+    assert b''.join(response.streaming_content) == b'abc'
+    assert 'ETag' not in response
+    assert csv_dump_upstream.call_count == 1
+    assert 'Cannot write CSV dump snapshots to /proc/nope/csv' in caplog.text
+
+
+@patch.object(helpers.CSVDumpSnapshot, 'publish', Mock(side_effect=OSError('No space left on device')))
+def test_csv_dump_snapshot_write_failed(client, csv_dump_upstream, csv_dump_snapshot_dir, caplog):
+    response = client.get(reverse('suppliers-csv-dump'), {'token': 'debug'})
+
+    assert response.status_code == 200
+    assert b''.join(response.streaming_content) == b'abc'
+    assert 'ETag' not in response
+    assert csv_dump_upstream.call_count == 2
+    assert os.listdir(csv_dump_snapshot_dir) == []
+    assert 'Cannot write CSV dump snapshot to' in caplog.text
+
+
+def test_csv_dump_outbound_call_budget(client, csv_dump_upstream, outbound_calls):
+    url = reverse('suppliers-csv-dump')
+
+    b''.join(client.get(url, {'token': 'debug'}).streaming_content)
+    b''.join(client.get(url, {'token': 'debug'}).streaming_content)
+
+    assert outbound_calls.snapshot() == {('directory-api', 'supplier.get_csv_dump'): 1}
+
+
+@patch('company.helpers.get_buyer_csv_dump')
+def test_csv_dump_outbound_call_budget_mocked(mock_get_buyer_csv_dump, client, outbound_calls):
+    mock_get_buyer_csv_dump.return_value = Mock(
+        status_code=200, headers={'Content-Type': 'text/csv', 'Content-Disposition': 'bar'}
+    )
+    mock_get_buyer_csv_dump.return_value.iter_content.return_value = [b'abc']
+
+    b''.join(client.get(reverse('buyers-csv-dump'), {'token': 'debug'}).streaming_content)
+
+    assert outbound_calls.snapshot() == {('directory-api', 'buyer.get_csv_dump'): 1}
+
+
+def test_verify_company_hub_outbound_call_budget(client, user, retrieve_profile_data, outbound_calls):
+    retrieve_profile_data['is_verified'] = False
+    client.force_login(user)
+
+    client.get(reverse('verify-company-hub'))
+
+    outbound_calls.assert_budget(1, service='directory-api')
+    outbound_calls.assert_budget(1, service='sso')
+
+
+def test_send_verification_letter_outbound_call_budget(client, user, retrieve_profile_data, outbound_calls):
+    retrieve_profile_data['is_verified'] = False
+    client.force_login(user)
+
+    client.get(reverse('verify-company-address'))
+
+    outbound_calls.assert_budget(1, service='directory-api')
+
+
+@patch.object(api_client.company, 'profile_update', return_value=create_response(200))
+def test_send_verification_letter_done_outbound_call_budget(
+    mock_profile_update, send_verification_letter_end_to_end, retrieve_profile_data, outbound_calls
+):
+    retrieve_profile_data['is_verified'] = False
+
+    send_verification_letter_end_to_end()
+
+    outbound_calls.assert_budget(1, endpoint='company.profile_retrieve')
+    outbound_calls.assert_budget(2, service='directory-api')
+
+
+@patch.object(api_client.company, 'verify_with_code', return_value=create_response(200))
+def test_company_address_verification_outbound_call_budget(
+    mock_verify_with_code, address_verification_end_to_end, retrieve_profile_data, outbound_calls
+):
+    retrieve_profile_data['is_verified'] = False
+
+    address_verification_end_to_end()
+
+    outbound_calls.assert_budget(1, endpoint='company.verify_with_code')
+    outbound_calls.assert_budget(2, service='directory-api')
+
+
+@patch.object(forms.CompaniesHouseClient, 'verify_oauth2_code')
+@patch.object(api_client.company, 'verify_with_companies_house', return_value=create_response(200))
+def test_companies_house_callback_outbound_call_budget(
+    mock_verify_with_companies_house, mock_verify_oauth2_code, client, user, retrieve_profile_data, outbound_calls
+):
+    retrieve_profile_data['is_verified'] = False
+    client.force_login(user)
+    mock_verify_oauth2_code.return_value = create_response(200, {'access_token': 'abc'})
+
+    client.get(reverse('verify-companies-house-callback'), {'code': '1'})
+
+    outbound_calls.assert_budget(1, service='companies-house')
+    outbound_calls.assert_budget(2, service='directory-api')
+
+
+@patch.object(api_client.supplier, 'unsubscribe', return_value=create_response(200))
+def test_unsubscribe_outbound_call_budget(mock_unsubscribe, client, user, outbound_calls):
+    client.force_login(user)
+
+    client.post(reverse('unsubscribe'))
+
+    outbound_calls.assert_budget(1, service='directory-api')
+
+
+def test_send_verification_letter_wizard_data_not_in_session_cookie(client, user, settings, retrieve_profile_data):
+    retrieve_profile_data['is_verified'] = False
+    client.force_login(user)
+
+    client.get(reverse('verify-company-address'))
+
+    assert settings.SESSION_COOKIE_NAME not in client.cookies
+    assert 'wizard_send_verification_letter_view' in client.cookies
+
+
+def test_validated_step_cache_signature_matches_stored_data():
+    submitted = QueryDict('address-code=111111111111&company_address_verification_view-current_step=address')
+    stored = MultiValueDict(dict(submitted.lists()))
+
+    get_data_signature = views.ValidatedStepCacheMixin.get_data_signature
+
+    assert get_data_signature(submitted) == get_data_signature(stored)
+    assert get_data_signature(submitted) != get_data_signature(QueryDict('address-code=222222222222'))
+
+
+@patch.object(forms.CompanyAddressVerificationForm, 'full_clean', autospec=True)
+@patch.object(api_client.company, 'profile_update', return_value=create_response(200))
+def test_send_verification_letter_validates_once(
+    mock_profile_update, mock_full_clean, send_verification_letter_end_to_end, retrieve_profile_data
+):
+    def full_clean(form):
+        form._errors = {}
+        form.cleaned_data = {'postal_full_name': 'Jeremy', 'address_confirmed': True}
+    mock_full_clean.side_effect = full_clean
+    retrieve_profile_data['is_verified'] = False
+
+    send_verification_letter_end_to_end()
+
+    assert mock_full_clean.call_count == 1
+    assert mock_profile_update.call_count == 1
+
+
+@pytest.mark.parametrize('url_name', ['verify-company-hub', 'verify-company-address'])
+def test_company_profile_etag_not_modified(client, user, retrieve_profile_data, url_name):
+    retrieve_profile_data['is_verified'] = False
+    client.force_login(user)
+
+    response = client.get(reverse(url_name))
+
+    assert response.status_code == 200
+    assert response['ETag'].startswith('W/"')
+    assert response['Cache-Control'] == 'private, no-cache'
+
+    with patch('django.template.response.TemplateResponse.render') as mock_render:
+        response = client.get(reverse(url_name), HTTP_IF_NONE_MATCH=response['ETag'])
+
+    assert response.status_code == 304
+    assert response['ETag']
+    assert mock_render.call_count == 0
+
+
+def test_company_profile_etag_changes_with_profile(client, user, retrieve_profile_data):
+    retrieve_profile_data['is_verified'] = False
+    client.force_login(user)
+
+    etag = client.get(reverse('verify-company-hub'))['ETag']
+    retrieve_profile_data['name'] = 'Renamed company'
+    cache.clear()
+    response = client.get(reverse('verify-company-hub'), HTTP_IF_NONE_MATCH=etag)
+
+    assert response.status_code == 200
+    assert response['ETag'] != etag
+
+
+def test_company_profile_etag_changes_with_user(
+    client, user, retrieve_profile_data, auth_backend, session_user_cache, settings
+):
+    settings.MAGNA_HEADER = True
+    retrieve_profile_data['is_verified'] = False
+    client.force_login(user)
+    etag = None
+    for first_name in ['Alice', 'Bob']:
+        session_user_cache.clear()
+        auth_backend.return_value = create_response(
+            200, {'id': 1, 'email': 'jim@example.com', 'hashed_uuid': '987', 'user_profile': {'first_name': first_name}}
+        )
+        response = client.get(reverse('verify-company-hub'), HTTP_IF_NONE_MATCH=etag or '')
+        etag = response['ETag']
+
+    assert response.status_code == 200
+    assert b'Hi Bob' in response.content
+
+
+@pytest.mark.parametrize('name,value', [
+    ('FEATURE_FLAGS', {'MAINTENANCE_MODE_ON': False, 'NEW_FEATURE_ON': True}),
+    ('MAGNA_HEADER', True),
+    ('PAGE_ETAG_VERSION', 'next'),
+])
+def test_company_profile_etag_changes_with_settings(client, user, retrieve_profile_data, settings, name, value):
+    retrieve_profile_data['is_verified'] = False
+    client.force_login(user)
+
+    etag = client.get(reverse('verify-company-hub'))['ETag']
+    setattr(settings, name, value)
+    response = client.get(reverse('verify-company-hub'), HTTP_IF_NONE_MATCH=etag)
+
+    assert response.status_code == 200
+    assert response['ETag'] != etag
+
+
+def test_company_profile_etag_no_extra_outbound_calls(client, user, retrieve_profile_data, outbound_calls):
+    retrieve_profile_data['is_verified'] = False
+    client.force_login(user)
+
+    client.get(reverse('verify-company-hub'), HTTP_IF_NONE_MATCH='W/"stale"')
+
+    outbound_calls.assert_budget(1, service='directory-api')
+
+
+def test_verify_company_hub_header_fragment_cached(client, user, retrieve_profile_data, fragment_cache):
+    retrieve_profile_data['is_verified'] = False
+    client.force_login(user)
+
+    first = client.get(reverse('verify-company-hub'))
+    second = client.get(reverse('verify-company-hub'))
+
+    assert b'header-sign-out-link' in first.content
+    assert first.content == second.content
+    # the header of a logged in user is not cached
+    assert len(fragment_cache.entries) == 2
+
+
+def test_verify_company_hub_header_not_shared_between_users(
+    client, user, retrieve_profile_data, auth_backend, session_user_cache, settings
+):
+    settings.MAGNA_HEADER = True
+    retrieve_profile_data['is_verified'] = False
+    client.force_login(user)
+    contents = []
+    for first_name in ['Alice', 'Bob']:
+        session_user_cache.clear()
+        auth_backend.return_value = create_response(
+            200, {'id': 1, 'email': 'jim@example.com', 'hashed_uuid': '987', 'user_profile': {'first_name': first_name}}
+        )
+        contents.append(client.get(reverse('verify-company-hub')).content)
+
+    assert b'Hi Alice' in contents[0]
+    assert b'Hi Bob' in contents[1]
+    assert b'Hi Alice' not in contents[1]
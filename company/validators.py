@@ -2,12 +2,15 @@ from django.forms import ValidationError
 
 from directory_api_client.client import api_client
 
+from company.helpers import validator_cost
+
 
 MESSAGE_INVALID_CODE = 'Invalid code.'
 MESSAGE_REMOVE_EMAIL = 'Please remove the email address.'
 
 
 def verify_with_code(sso_session_id):
+    @validator_cost(100, remote=True, name='verify_with_code')
     def inner(value):
         response = api_client.company.verify_with_code(
             sso_session_id=sso_session_id, code=str(value)
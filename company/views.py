@@ -1,17 +1,27 @@
+import hashlib
+import json
+
 from directory_constants import urls
 from directory_api_client.client import api_client
 from formtools.wizard.views import SessionWizardView
 from requests.exceptions import HTTPError
 import sentry_sdk
 
-from django.http import HttpResponse, HttpResponseForbidden
+from django.conf import settings
+from django.http import FileResponse, HttpResponseForbidden, StreamingHttpResponse
 from django.shortcuts import redirect
 from django.template.response import TemplateResponse
+from django.utils import translation
+from django.utils.cache import get_conditional_response
+from django.utils.datastructures import MultiValueDict
+from django.utils.functional import cached_property
+from django.utils.http import http_date, quote_etag
 from django.views.generic import RedirectView, TemplateView, View
 from django.views.generic.edit import FormView
 from django.urls import reverse
 
 from company import forms, helpers
+from core.templating import get_templates_digest
 from enrolment.helpers import CompaniesHouseClient
 
 
@@ -57,6 +67,7 @@ class UpdateCompanyProfileOnFormWizardDoneMixin:
             )
             raise
         else:
+            self.request.user.invalidate_company()
             return self.handle_profile_update_success()
 
 
@@ -70,15 +81,100 @@ class GetTemplateForCurrentStepMixin:
         return [self.templates[self.steps.current]]
 
 
+class ValidatedStepCacheMixin:
+    """
+    Reuse a bound form rather than build and validate it again when the
+    wizard asks for the same step with the same data during a request.
+
+    formtools validates the submitted step, then every step again in
+    `render_done`, and `get_all_cleaned_data` validates them once more, so
+    remote validators such as `verify_with_code` would otherwise call the
+    upstream several times for one submission.
+
+    """
+
+    @cached_property
+    def validated_forms(self):
+        return {}
+
+    @staticmethod
+    def get_data_signature(data):
+        lists = data.lists() if isinstance(data, MultiValueDict) else data.items()
+        serialized = json.dumps(sorted(lists), separators=(',', ':'), default=str)
+        return hashlib.sha256(serialized.encode()).hexdigest()
+
+    def get_form(self, step=None, data=None, files=None):
+        if data is None or files:
+            return super().get_form(step=step, data=data, files=files)
+        key = (step or self.steps.current, self.get_data_signature(data))
+        if key not in self.validated_forms:
+            self.validated_forms[key] = super().get_form(step=step, data=data, files=files)
+        return self.validated_forms[key]
+
+
+class CompanyProfileETagMixin:
+    """
+    Answer a GET with 304 Not Modified, without rendering the page, when the
+    user already has it. The weak ETag is derived from what the page shows:
+    the company profile the access policy has already retrieved, the SSO
+    user, the settings the page renders, the language and the templates. It
+    costs no extra upstream call.
+
+    The route needs a private CachePolicy that allows the browser to store
+    the page, otherwise there is nothing to revalidate.
+
+    """
+
+    # e.g., the magna header greets the user by first name
+    etag_user_fields = ('id', 'email', 'first_name', 'last_name')
+    etag_settings = ('PAGE_ETAG_VERSION', 'FEATURE_FLAGS', 'MAGNA_HEADER')
+
+    @cached_property
+    def etag(self):
+        user = self.request.user
+        serialized = json.dumps(
+            [
+                get_templates_digest(),
+                self.get_template_names(),
+                translation.get_language(),
+                {name: getattr(user, name) for name in self.etag_user_fields},
+                {name: getattr(settings, name) for name in self.etag_settings},
+                user.company,
+            ],
+            sort_keys=True,
+            separators=(',', ':'),
+            default=str,
+        )
+        return 'W/' + quote_etag(hashlib.sha256(serialized.encode()).hexdigest())
+
+    def get_not_modified_response(self):
+        """@returns HttpResponseNotModified if the user has the page, or None"""
+
+        response = get_conditional_response(self.request, etag=self.etag)
+        if response is not None:
+            response['ETag'] = self.etag
+        return response
+
+    def render_to_response(self, *args, **kwargs):
+        response = super().render_to_response(*args, **kwargs)
+        if self.request.method == 'GET':
+            response['ETag'] = self.etag
+        return response
+
+
 class SendVerificationLetterView(
+    CompanyProfileETagMixin,
     GetTemplateForCurrentStepMixin,
     UpdateCompanyProfileOnFormWizardDoneMixin,
+    ValidatedStepCacheMixin,
     SessionWizardView
 ):
 
     ADDRESS = 'address'
     SENT = 'sent'
 
+    storage_name = 'core.wizard_storage.CacheStorage'
+
     form_list = (
         (ADDRESS, forms.CompanyAddressVerificationForm),
     )
@@ -108,11 +204,20 @@ class SendVerificationLetterView(
         context = {'profile_url': urls.domestic.SINGLE_SIGN_ON_PROFILE / 'business-profile'}
         return TemplateResponse(self.request, self.templates[self.SENT], context)
 
+    def get(self, request, *args, **kwargs):
+        # as SessionWizardView.get, which restarts the wizard
+        self.storage.reset()
+        self.storage.current_step = self.steps.first
+        return self.get_not_modified_response() or self.render(self.get_form())
+
 
-class CompanyVerifyView(TemplateView):
+class CompanyVerifyView(CompanyProfileETagMixin, TemplateView):
 
     template_name = 'company-verify-hub.html'
 
+    def get(self, request, *args, **kwargs):
+        return self.get_not_modified_response() or super().get(request, *args, **kwargs)
+
     def get_context_data(self, **kwargs):
         return {
             'company': self.request.user.company,
@@ -121,12 +226,15 @@ class CompanyVerifyView(TemplateView):
 
 class CompanyAddressVerificationView(
     GetTemplateForCurrentStepMixin,
+    ValidatedStepCacheMixin,
     SessionWizardView
 ):
 
     ADDRESS = 'address'
     SUCCESS = 'success'
 
+    storage_name = 'core.wizard_storage.CacheStorage'
+
     form_list = (
         (ADDRESS, forms.CompanyCodeVerificationForm),
     )
@@ -141,6 +249,9 @@ class CompanyAddressVerificationView(
         return kwargs
 
     def done(self, *args, **kwargs):
+        # the code was verified during validation, so the company is now
+        # verified upstream
+        self.request.user.invalidate_company()
         return TemplateResponse(
             self.request,
             self.templates[self.SUCCESS]
@@ -216,11 +327,17 @@ class CompaniesHouseOauth2CallbackView(
         kwargs['redirect_uri'] = self.redirect_uri
         return kwargs
 
+    def form_invalid(self, form):
+        if form.has_error('code', code='unavailable'):
+            return TemplateResponse(self.request, self.error_template)
+        return super().form_invalid(form)
+
     def form_valid(self, form):
         response = api_client.company.verify_with_companies_house(
             sso_session_id=self.request.user.session_id,
             access_token=form.oauth2_response.json()['access_token']
         )
+        self.request.user.invalidate_company()
         if response.status_code == 500:
             return TemplateResponse(self.request, self.error_template)
         else:
@@ -228,30 +345,78 @@ class CompaniesHouseOauth2CallbackView(
 
 
 class CSVDumpGenericView(View):
+    # the dumps are relayed chunk by chunk rather than read into memory, so
+    # worker memory does not grow with the size of the dump
+    chunk_size = 64 * 1024
 
     def get(self, request, *args, **kwargs):
         token = request.GET.get('token')
         if not token:
             return HttpResponseForbidden('Token not provided')
+        snapshot = helpers.CSVDumpSnapshot(
+            directory=settings.CSV_DUMP_SNAPSHOT_DIR,
+            name=self.snapshot_name,
+            token=token,
+        )
+        metadata = snapshot.get_fresh_metadata(max_age=settings.CSV_DUMP_SNAPSHOT_MAX_AGE)
+        if metadata:
+            response = self.get_snapshot_response(snapshot, metadata)
+            if response:
+                return response
         csv_file = self.get_file(token)
-        response = HttpResponse(
-            csv_file.content, content_type=csv_file.headers['Content-Type']
+        content = helpers.iter_response_content(csv_file, chunk_size=self.chunk_size)
+        if csv_file.status_code == 200:
+            # the dump is saved before it is served, so every pull gets the
+            # validators and a poll for an unchanged dump gets a 304
+            temp_file = snapshot.create_temp_file()
+            if temp_file is not None:
+                metadata = snapshot.save(
+                    temp_file=temp_file,
+                    chunks=content,
+                    content_type=csv_file.headers['Content-Type'],
+                    content_disposition=csv_file.headers['Content-Disposition'],
+                )
+                if metadata:
+                    response = self.get_snapshot_response(snapshot, metadata)
+                    if response:
+                        return response
+                # the part of the dump already read was lost with the snapshot
+                csv_file = self.get_file(token)
+                content = helpers.iter_response_content(csv_file, chunk_size=self.chunk_size)
+        response = StreamingHttpResponse(
+            content, content_type=csv_file.headers['Content-Type'],
         )
         response['Content-Disposition'] = csv_file.headers[
             'Content-Disposition'
         ]
         return response
 
+    def get_snapshot_response(self, snapshot, metadata):
+        etag = quote_etag(metadata['digest'])
+        last_modified = int(metadata['created'])
+        response = get_conditional_response(self.request, etag=etag, last_modified=last_modified)
+        if response is None:
+            csv_file = snapshot.open(metadata)
+            if csv_file is None:
+                return None
+            response = FileResponse(csv_file, content_type=metadata['content_type'])
+            response['Content-Disposition'] = metadata['content_disposition']
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        return response
+
 
 class BuyerCSVDumpView(CSVDumpGenericView):
+    snapshot_name = 'buyers'
 
     @staticmethod
     def get_file(token):
-        return api_client.buyer.get_csv_dump(token)
+        return helpers.get_buyer_csv_dump(token)
 
 
 class SupplierCSVDumpView(CSVDumpGenericView):
+    snapshot_name = 'suppliers'
 
     @staticmethod
     def get_file(token):
-        return api_client.supplier.get_csv_dump(token)
+        return helpers.get_supplier_csv_dump(token)
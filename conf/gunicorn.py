@@ -0,0 +1,26 @@
+"""
+gunicorn settings, passed with --config. See the Procfile.
+"""
+
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+def post_worker_init(worker):
+    # runs in each worker once the application is loaded and before it
+    # accepts requests, so the first requests do not pay to parse templates
+    from django.conf import settings
+
+    from core.templating import get_templates_digest, precompile_templates
+
+    if not settings.PRECOMPILE_TEMPLATES_ON_BOOT:
+        return
+    timings = precompile_templates()
+    get_templates_digest()
+    total = sum(seconds for name, seconds, error in timings)
+    logger.info('%s templates parsed in %.3fs', len(timings), total)
+    for name, seconds, error in timings:
+        if error:
+            logger.warning('Template %s failed to parse: %s', name, error)
@@ -0,0 +1,27 @@
+from directory_constants.urls import domestic
+
+from core.redirects import Redirect
+
+
+# the retired urls, relative to the /find-a-buyer/ prefix
+legacy_redirects = [
+    Redirect('register/', domestic.SINGLE_SIGN_ON_PROFILE / 'enrol/', prefix=True),
+    Redirect('register-submit/', domestic.SINGLE_SIGN_ON_PROFILE / 'enrol/'),
+    Redirect('register', domestic.SINGLE_SIGN_ON_PROFILE / 'enrol/', name='register'),
+    Redirect('company-profile/', domestic.SINGLE_SIGN_ON_PROFILE, name='company-detail'),
+    Redirect('company-profile/edit/', domestic.SINGLE_SIGN_ON_PROFILE),
+    Redirect('company-profile/edit/logo/', domestic.SINGLE_SIGN_ON_PROFILE),
+    Redirect('company-profile/edit/description/', domestic.SINGLE_SIGN_ON_PROFILE),
+    Redirect('company-profile/edit/key-facts/', domestic.SINGLE_SIGN_ON_PROFILE),
+    Redirect('company-profile/edit/sectors/', domestic.SINGLE_SIGN_ON_PROFILE),
+    Redirect('company-profile/edit/contact/', domestic.SINGLE_SIGN_ON_PROFILE),
+    Redirect('company-profile/edit/address/', domestic.SINGLE_SIGN_ON_PROFILE),
+    Redirect('company-profile/edit/social-media/', domestic.SINGLE_SIGN_ON_PROFILE),
+    Redirect('company/case-study/create/', domestic.SINGLE_SIGN_ON_PROFILE, name='company-case-study-create'),
+    Redirect('company/case-study/edit/<int:id>/', domestic.SINGLE_SIGN_ON_PROFILE),
+    Redirect(
+        'company/case-study/edit/',
+        domestic.SINGLE_SIGN_ON_PROFILE,
+        name='company-case-study-create-backwards-compatible',
+    ),
+]
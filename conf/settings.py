@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/1.9/ref/settings/
 '''
 
 import os
+import tempfile
 from typing import Any, Dict
 
 
@@ -72,16 +73,30 @@ MIDDLEWARE = [
     'directory_components.middleware.MaintenanceModeMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.LegacyRedirectMiddleware',
     'core.middleware.PrefixUrlMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    # must come before any middleware that reads the session or the user
+    'core.middleware.AnonymousRouteMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'core.middleware.GA360Middleware',
     'directory_components.middleware.CheckGATags',
-    'django.contrib.sessions.middleware.SessionMiddleware',
     'directory_sso_api_client.middleware.AuthenticationMiddleware',
-    'directory_components.middleware.NoCacheMiddlware',
+    'core.middleware.CachePolicyMiddleware',
 ]
 
+# opt-in: time the request and response phases of every middleware and log a
+# summary every MIDDLEWARE_TIMING_LOG_INTERVAL requests (see conf/wsgi.py)
+MIDDLEWARE_TIMING_ENABLED = env.bool('MIDDLEWARE_TIMING_ENABLED', False)
+MIDDLEWARE_TIMING_LOG_INTERVAL = env.int('MIDDLEWARE_TIMING_LOG_INTERVAL', 1000)
+
+# the retired urls redirected by core.middleware.LegacyRedirectMiddleware
+LEGACY_REDIRECTS = 'conf.redirects.legacy_redirects'
+LEGACY_REDIRECT_CACHE_MAX_AGE = env.int('LEGACY_REDIRECT_CACHE_MAX_AGE', 60 * 60)
+
+# how long the CDN may keep the responses of routes with a public CachePolicy
+PUBLIC_CACHE_MAX_AGE = env.int('PUBLIC_CACHE_MAX_AGE', 60 * 60)
+
 FEATURE_URL_PREFIX_ENABLED = True
 URL_PREFIX_DOMAIN = env.str('URL_PREFIX_DOMAIN')
 ROOT_URLCONF = 'conf.urls'
@@ -90,17 +105,23 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # parsed templates are kept for the life of the process. See the
+            # precompile_templates command and conf/gunicorn.py
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
-                'directory_components.context_processors.sso_processor',
-                'directory_components.context_processors.urls_processor',
-                'directory_components.context_processors.header_footer_processor',
-                'directory_components.context_processors.feature_flags',
-                'directory_components.context_processors.analytics',
-                'directory_components.context_processors.cookie_notice',
+                'core.context_processors.sso_processor',
+                'core.context_processors.urls_processor',
+                'core.context_processors.header_footer_processor',
+                'core.context_processors.feature_flags',
+                'core.context_processors.analytics',
+                'core.context_processors.cookie_notice',
             ],
         },
     },
@@ -128,6 +149,24 @@ CACHES = {
     'api_fallback': cache,
 }
 
+# company profile shared by all requests in a SSO session. Bump the version
+# when the shape of the cached profile changes.
+COMPANY_PROFILE_CACHE_TIMEOUT = env.int('COMPANY_PROFILE_CACHE_TIMEOUT', 30)
+COMPANY_PROFILE_CACHE_VERSION = 1
+
+# part of the ETag of the verify pages. Set it to the release, or bump it, to
+# stop browsers reusing pages after a change the ETag cannot see otherwise.
+PAGE_ETAG_VERSION = env.str('PAGE_ETAG_VERSION', '1')
+
+# rendered header, footer and cookie notice, kept per process and, if
+# FRAGMENT_CACHE_L2 names a cache, across processes
+FRAGMENT_CACHE_TIMEOUT = env.int('FRAGMENT_CACHE_TIMEOUT', 5 * 60)
+FRAGMENT_CACHE_MAXSIZE = env.int('FRAGMENT_CACHE_MAXSIZE', 256)
+FRAGMENT_CACHE_L2 = env.str('FRAGMENT_CACHE_L2', 'default')
+
+# parse every template when a gunicorn worker starts (see conf/gunicorn.py)
+PRECOMPILE_TEMPLATES_ON_BOOT = env.bool('PRECOMPILE_TEMPLATES_ON_BOOT', True)
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/1.9/topics/i18n/
@@ -239,6 +278,11 @@ DIRECTORY_API_CLIENT_API_KEY = env.str('DIRECTORY_API_CLIENT_API_KEY')
 DIRECTORY_API_CLIENT_SENDER_ID = env.str('DIRECTORY_API_CLIENT_SENDER_ID', 'directory')
 DIRECTORY_API_CLIENT_DEFAULT_TIMEOUT = env.str('DIRECTORY_API_CLIENT_DEFAULT_TIMEOUT', 15)
 
+# local copies of the data-science CSV dumps, served to repeat pulls until
+# they are older than CSV_DUMP_SNAPSHOT_MAX_AGE seconds
+CSV_DUMP_SNAPSHOT_DIR = env.str('CSV_DUMP_SNAPSHOT_DIR', os.path.join(tempfile.gettempdir(), 'csv-dump-snapshots'))
+CSV_DUMP_SNAPSHOT_MAX_AGE = env.int('CSV_DUMP_SNAPSHOT_MAX_AGE', 60 * 5)
+
 # directory clients
 DIRECTORY_CLIENT_CORE_CACHE_EXPIRE_SECONDS = 60 * 60 * 24 * 30  # 30 days
 
@@ -253,6 +297,18 @@ COMPANIES_HOUSE_CALLBACK_DOMAIN = env.str(
 )
 COMPANIES_HOUSE_URL = env.str('COMPANIES_HOUSE_URL', 'https://account.companieshouse.gov.uk')
 COMPANIES_HOUSE_API_URL = env.str('COMPANIES_HOUSE_API_URL', 'https://api.companieshouse.gov.uk')
+# a GET is retried COMPANIES_HOUSE_RETRIES times on connection and read
+# errors, each attempt waiting up to the connect plus read timeout, with a
+# jittered backoff in between. The worst case for one call is therefore
+# (RETRIES + 1) * (CONNECT_TIMEOUT + READ_TIMEOUT) + backoff, about 40s with
+# the defaults. The circuit breaker then refuses calls for RESET_TIMEOUT.
+COMPANIES_HOUSE_CONNECT_TIMEOUT = env.float('COMPANIES_HOUSE_CONNECT_TIMEOUT', 3.05)
+COMPANIES_HOUSE_READ_TIMEOUT = env.float('COMPANIES_HOUSE_READ_TIMEOUT', 10)
+COMPANIES_HOUSE_POOL_MAXSIZE = env.int('COMPANIES_HOUSE_POOL_MAXSIZE', 10)
+COMPANIES_HOUSE_RETRIES = env.int('COMPANIES_HOUSE_RETRIES', 2)
+COMPANIES_HOUSE_RETRY_BACKOFF_FACTOR = env.float('COMPANIES_HOUSE_RETRY_BACKOFF_FACTOR', 0.3)
+COMPANIES_HOUSE_CIRCUIT_BREAKER_FAILURE_THRESHOLD = env.int('COMPANIES_HOUSE_CIRCUIT_BREAKER_FAILURE_THRESHOLD', 5)
+COMPANIES_HOUSE_CIRCUIT_BREAKER_RESET_TIMEOUT = env.int('COMPANIES_HOUSE_CIRCUIT_BREAKER_RESET_TIMEOUT', 30)
 
 # directory-companies-house-search
 DIRECTORY_CH_SEARCH_CLIENT_BASE_URL = env.str('DIRECTORY_CH_SEARCH_CLIENT_BASE_URL')
@@ -272,6 +328,11 @@ SSO_PROXY_SIGNUP_URL = env.str('SSO_PROXY_SIGNUP_URL')
 SSO_PROFILE_URL = env.str('SSO_PROFILE_URL')
 SSO_PROXY_REDIRECT_FIELD_NAME = env.str('SSO_PROXY_REDIRECT_FIELD_NAME')
 SSO_SESSION_COOKIE = env.str('SSO_SESSION_COOKIE')
+# recent session-user lookups are reused for this many seconds, per process
+# and, if SSO_SESSION_CACHE_L2 names a cache, across processes
+SSO_SESSION_CACHE_TIMEOUT = env.int('SSO_SESSION_CACHE_TIMEOUT', 5)
+SSO_SESSION_CACHE_MAXSIZE = env.int('SSO_SESSION_CACHE_MAXSIZE', 1024)
+SSO_SESSION_CACHE_L2 = env.str('SSO_SESSION_CACHE_L2', '')
 
 SECURE_SSL_REDIRECT = env.bool('SECURE_SSL_REDIRECT', True)
 USE_X_FORWARDED_HOST = True
@@ -297,6 +358,10 @@ PRIVACY_COOKIE_DOMAIN = env.str('PRIVACY_COOKIE_DOMAIN')
 SESSION_ENGINE = 'django.contrib.sessions.backends.signed_cookies'
 SESSION_COOKIE_SECURE = env.bool('SESSION_COOKIE_SECURE', True)
 SESSION_COOKIE_NAME = env.str('SESSION_COOKIE_NAME', 'buyer_sessionid')
+
+# wizard step data is kept in this cache rather than in the cookie session
+WIZARD_STORAGE_CACHE = 'default'
+WIZARD_STORAGE_TIMEOUT = env.int('WIZARD_STORAGE_TIMEOUT', 60 * 60)
 CSRF_COOKIE_SECURE = True
 
 LANGUAGE_COOKIE_SECURE = env.bool('LANGUAGE_COOKIE_SECURE', True)
@@ -327,12 +392,19 @@ DIRECTORY_HEALTHCHECK_BACKENDS = [
     # INSTALLED_APPS's health_check.cache
 ]
 
+# /metrics
+METRICS_TOKEN = env.str('METRICS_TOKEN', DIRECTORY_HEALTHCHECK_TOKEN)
+
+# pingdom/ping.xml: per-check deadline, and how long a result is reused
+PINGDOM_CHECK_TIMEOUT = env.float('PINGDOM_CHECK_TIMEOUT', 5)
+PINGDOM_CACHE_SECONDS = env.float('PINGDOM_CACHE_SECONDS', 5)
+
 # Internal CH
 INTERNAL_CH_BASE_URL = env.str('INTERNAL_CH_BASE_URL', '')
 INTERNAL_CH_API_KEY = env.str('INTERNAL_CH_API_KEY', '')
 
 # Authentication
-AUTHENTICATION_BACKENDS = ['directory_sso_api_client.backends.SSOUserBackend']
+AUTHENTICATION_BACKENDS = ['sso.backends.CachedSSOUserBackend']
 
 AUTH_USER_MODEL = 'sso.SSOUser'
 
@@ -1,20 +1,21 @@
+import conf.redirects
 import conf.sitemaps
 
 import directory_healthcheck.views
 import directory_components.views
-from directory_components.decorators import skip_ga360
 from directory_constants.urls import domestic
 
 from django.urls import reverse_lazy, path, re_path
+from django.conf import settings
 from django.conf.urls import include
-from django.contrib.auth.decorators import user_passes_test
 from django.contrib.auth.decorators import login_required
 from django.contrib.sitemaps.views import sitemap
 from django.views.decorators.http import require_http_methods
-from django.views.generic import RedirectView
 
 import company.views
-from core.views import PingDomView
+from core.policies import AccessPolicy, CachePolicy, Gate, anonymous_only, no_store
+from core.redirects import get_url_patterns
+from core.views import MetricsView, PingDomView
 
 
 sitemaps = {
@@ -25,64 +26,65 @@ sitemaps = {
 require_get = require_http_methods(['GET'])
 
 
-def company_required(function):
-    inner = user_passes_test(
-        lambda user: bool(user.company),
-        reverse_lazy('index'),
-        None
-    )
-    return login_required(inner(function))
-
-
-def no_company_required(function):
-    inner = user_passes_test(
-        lambda user: not bool(user.company),
-        domestic.FIND_A_BUYER,
-        None
-    )
-    return login_required(inner(function))
-
-
-def owner_required(function):
-    inner = user_passes_test(
-        lambda user: user.supplier.get('is_company_owner', False),
-        domestic.FIND_A_BUYER,
-        None
-    )
-    return company_required(inner(function))
-
-
-def not_owner_required(function):
-    inner = user_passes_test(
-        lambda user: not user.supplier.get('is_company_owner', False),
-        domestic.FIND_A_BUYER,
-        None,
-    )
-    return login_required(inner(function))
-
-
-def unverified_required(function):
-    inner = user_passes_test(
-        lambda user: not user.company['is_verified'],
-        domestic.FIND_A_BUYER,
-        None
-    )
-    return company_required(inner(function))
-
-
-def no_letter_required(function):
-    inner = user_passes_test(
-        lambda user: not user.company['is_verification_letter_sent'],
-        reverse_lazy('verify-company-address-confirm'),
-        None
-    )
-    return unverified_required(inner(function))
+has_company = Gate(
+    name='has_company',
+    test=lambda user: bool(user.company),
+    redirect_url=reverse_lazy('index'),
+    profiles=['company'],
+)
+has_no_company = Gate(
+    name='has_no_company',
+    test=lambda user: not bool(user.company),
+    redirect_url=domestic.FIND_A_BUYER,
+    profiles=['company'],
+)
+is_owner = Gate(
+    name='is_owner',
+    test=lambda user: user.supplier.get('is_company_owner', False),
+    redirect_url=domestic.FIND_A_BUYER,
+    profiles=['supplier'],
+)
+is_not_owner = Gate(
+    name='is_not_owner',
+    test=lambda user: not user.supplier.get('is_company_owner', False),
+    redirect_url=domestic.FIND_A_BUYER,
+    profiles=['supplier'],
+)
+is_unverified = Gate(
+    name='is_unverified',
+    test=lambda user: not user.company['is_verified'],
+    redirect_url=domestic.FIND_A_BUYER,
+    profiles=['company'],
+)
+has_no_letter = Gate(
+    name='has_no_letter',
+    test=lambda user: not user.company['is_verification_letter_sent'],
+    redirect_url=reverse_lazy('verify-company-address-confirm'),
+    profiles=['company'],
+)
+
+company_required = AccessPolicy(has_company)
+no_company_required = AccessPolicy(has_no_company)
+# no route uses the owner policies at present. owner_required is the only
+# policy reading both profiles, so the only one that loads them concurrently.
+owner_required = AccessPolicy(has_company, is_owner)
+not_owner_required = AccessPolicy(is_not_owner)
+unverified_required = AccessPolicy(has_company, is_unverified)
+no_letter_required = AccessPolicy(has_company, is_unverified, has_no_letter)
+
+# responses that are the same for every user. Routes without a CachePolicy
+# are kept out of every cache for authenticated users.
+public_cache = CachePolicy(public=True, max_age=settings.PUBLIC_CACHE_MAX_AGE)
+# responses the browser may keep but must revalidate, e.g., with an ETag.
+# Responses to a form submission may echo what was submitted, so they are
+# not stored at all.
+private_cache = CachePolicy(methods=['GET', 'HEAD'])
 
 
 healthcheck_urls = [
     re_path(
         r'^$',
-        skip_ga360(directory_healthcheck.views.HealthcheckView.as_view()),
+        no_store(anonymous_only(directory_healthcheck.views.HealthcheckView.as_view())),
         name='healthcheck'
     ),
 ]
@@ -92,11 +94,11 @@ urlpatterns = [
     re_path(r'^healthcheck/', include((healthcheck_urls, 'healthcheck'), namespace='healthcheck')),
     re_path(
         r"^robots\.txt$",
-        skip_ga360(directory_components.views.RobotsView.as_view()),
+        public_cache(anonymous_only(directory_components.views.RobotsView.as_view())),
         name='robots'
     ),
     re_path(
-        r"^sitemap\.xml$", sitemap, {'sitemaps': sitemaps},
+        r"^sitemap\.xml$", public_cache(anonymous_only(sitemap)), {'sitemaps': sitemaps},
         name='sitemap'
     ),
     re_path(
@@ -106,12 +108,12 @@ urlpatterns = [
     ),
     re_path(
         r'^verify/$',
-        no_letter_required(company.views.CompanyVerifyView.as_view()),
+        private_cache(no_letter_required(company.views.CompanyVerifyView.as_view())),
         name='verify-company-hub'
     ),
     re_path(
         r'^verify/letter-send/$',
-        no_letter_required(company.views.SendVerificationLetterView.as_view()),
+        private_cache(no_letter_required(company.views.SendVerificationLetterView.as_view())),
         name='verify-company-address'
     ),
     re_path(
@@ -137,88 +139,28 @@ urlpatterns = [
     # the url to create case studies was ../edit/. That was bad naming.
     re_path(
         r'^data-science/buyers/$',
-        skip_ga360(company.views.BuyerCSVDumpView.as_view()),
+        private_cache(anonymous_only(company.views.BuyerCSVDumpView.as_view())),
         name='buyers-csv-dump'
     ),
     re_path(
         r'^data-science/suppliers/$',
-        skip_ga360(company.views.SupplierCSVDumpView.as_view()),
+        private_cache(anonymous_only(company.views.SupplierCSVDumpView.as_view())),
         name='suppliers-csv-dump'
     )
 ]
 
-urlpatterns += [
-    re_path(
-        r'^register/(?P<step>.+)/$',
-        RedirectView.as_view(url=domestic.SINGLE_SIGN_ON_PROFILE / 'enrol/'),
-    ),
-    re_path(
-        r'^register-submit/$',
-        RedirectView.as_view(url=domestic.SINGLE_SIGN_ON_PROFILE / 'enrol/'),
-    ),
-    re_path(
-        r'^company-profile/$',
-        RedirectView.as_view(url=domestic.SINGLE_SIGN_ON_PROFILE),
-        name='company-detail',
-    ),
-    re_path(
-        r'^company-profile/edit/$',
-        RedirectView.as_view(url=domestic.SINGLE_SIGN_ON_PROFILE)
-    ),
-    re_path(
-        r'^company-profile/edit/logo/$',
-        RedirectView.as_view(url=domestic.SINGLE_SIGN_ON_PROFILE),
-    ),
-    re_path(
-        r'^company-profile/edit/description/$',
-        RedirectView.as_view(url=domestic.SINGLE_SIGN_ON_PROFILE),
-    ),
-    re_path(
-        r'^company-profile/edit/key-facts/$',
-        RedirectView.as_view(url=domestic.SINGLE_SIGN_ON_PROFILE)
-    ),
-    re_path(
-        r'^company-profile/edit/sectors/$',
-        RedirectView.as_view(url=domestic.SINGLE_SIGN_ON_PROFILE),
-    ),
-    re_path(
-        r'^company-profile/edit/contact/$',
-        RedirectView.as_view(url=domestic.SINGLE_SIGN_ON_PROFILE),
-    ),
-    re_path(
-        r'^company-profile/edit/address/$',
-        RedirectView.as_view(url=domestic.SINGLE_SIGN_ON_PROFILE),
-    ),
-    re_path(
-        r'^company-profile/edit/social-media/$',
-        RedirectView.as_view(url=domestic.SINGLE_SIGN_ON_PROFILE)
-    ),
-    re_path(
-        r'^company/case-study/create/$',
-        RedirectView.as_view(url=domestic.SINGLE_SIGN_ON_PROFILE),
-        name='company-case-study-create',
-    ),
-    re_path(
-        r'^company/case-study/edit/(?P<id>[0-9]+)/$',
-        RedirectView.as_view(url=domestic.SINGLE_SIGN_ON_PROFILE),
-    ),
-    re_path(
-        r'^company/case-study/edit/$',
-        RedirectView.as_view(url=domestic.SINGLE_SIGN_ON_PROFILE),
-        name='company-case-study-create-backwards-compatible',
-    ),
-    re_path(
-        r'^register$',
-        RedirectView.as_view(url=domestic.SINGLE_SIGN_ON_PROFILE / 'enrol/'),
-        name='register',
-    ),
-]
+urlpatterns += get_url_patterns(conf.redirects.legacy_redirects)
 
 urlpatterns = [
     re_path(r'^find-a-buyer/', include(urlpatterns)),
     path(
         'pingdom/ping.xml',
-        skip_ga360(PingDomView.as_view()),
+        no_store(anonymous_only(PingDomView.as_view())),
         name='pingdom',
     ),
+    path(
+        'metrics',
+        no_store(anonymous_only(MetricsView.as_view())),
+        name='metrics',
+    ),
 ]
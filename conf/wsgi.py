@@ -7,10 +7,25 @@ For more information on this file, see
 https://docs.djangoproject.com/en/1.9/howto/deployment/wsgi/
 """
 
+import logging
 import os
 
+import django
+from django.conf import settings
+from django.core import checks
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "conf.settings")
 
-application = get_wsgi_application()
+django.setup(set_prefix=False)
+
+# gunicorn does not run the system checks, so report middleware problems
+# when the worker loads the application
+for message in checks.run_checks(tags=['middleware']):
+    logging.getLogger(__name__).warning(message)
+
+if settings.MIDDLEWARE_TIMING_ENABLED:
+    from core.instrumentation import TimedWSGIHandler
+    application = TimedWSGIHandler()
+else:
+    application = get_wsgi_application()
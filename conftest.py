@@ -3,8 +3,11 @@ from unittest import mock
 import pytest
 
 from django.contrib.auth import get_user_model
+from django.core.cache import caches as django_caches
 
-from core.tests.helpers import create_response
+from core.templatetags.fragment_cache import fragment_cache as template_fragment_cache
+from core.tests.helpers import count_outbound_calls, create_response
+from sso import backends
 
 
 @pytest.fixture(autouse=True)
@@ -14,6 +17,15 @@ def feature_flags(settings):
     yield settings.FEATURE_FLAGS
 
 
+@pytest.fixture(autouse=True)
+def caches(settings):
+    # keep tests isolated from each other and from a shared redis
+    cache = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+    settings.CACHES = {'default': cache, 'api_fallback': cache}
+    django_caches['default'].clear()
+    yield django_caches
+
+
 @pytest.fixture
 def user():
     SSOUser = get_user_model()
@@ -26,6 +38,20 @@ def user():
     )
 
 
+@pytest.fixture(autouse=True)
+def session_user_cache():
+    backends.session_user_cache.clear()
+    yield backends.session_user_cache
+    backends.session_user_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def fragment_cache():
+    template_fragment_cache.clear()
+    yield template_fragment_cache
+    template_fragment_cache.clear()
+
+
 @pytest.fixture(autouse=True)
 def auth_backend():
     patch = mock.patch(
@@ -50,3 +76,9 @@ def client(client, auth_backend, settings):
         )
     client.force_login = force_login
     return client
+
+
+@pytest.fixture
+def outbound_calls():
+    with count_outbound_calls() as outbound_calls:
+        yield outbound_calls
@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class CoreConfig(AppConfig):
+    name = 'core'
+
+    def ready(self):
+        from core import checks  # noqa: F401 registers the system checks
+        from core.instrumentation import instrument_api_clients
+
+        instrument_api_clients()
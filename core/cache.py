@@ -0,0 +1,107 @@
+from collections import OrderedDict
+import hashlib
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+def hash_key(prefix, key):
+    """
+    @returns str - cache key for `key`, which is hashed as it may be a
+    credential, e.g., a session id, that should not appear in key names
+
+    """
+
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return f'{prefix}:{digest}'
+
+
+def reset_after_fork(reset):
+    """
+    Call `reset` in forked children, so they do not use the parent's state.
+    `reset` should replace any lock too, as another thread may have held it
+    during the fork.
+
+    """
+
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=reset)
+
+
+class TieredCache:
+    """
+    Values kept for the number of seconds in the `timeout_setting` setting.
+
+    The first level is a per-process LRU of at most `maxsize_setting`
+    values. The optional second level is the cache named by `l2_setting`,
+    e.g., the redis-backed 'default', which is shared by every process.
+
+    Lookups are counted in `lookups` by result: 'l1_hit', 'l2_hit' or 'miss'.
+
+    """
+
+    key_prefix = None
+    timeout_setting = None
+    maxsize_setting = None
+    l2_setting = None
+    lookups = None
+
+    def __init__(self):
+        self.clear()
+        reset_after_fork(self.clear)
+
+    def clear(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    @property
+    def timeout(self):
+        return getattr(settings, self.timeout_setting)
+
+    def get_cache_key(self, key):
+        return hash_key(self.key_prefix, key)
+
+    def get_l2_cache(self):
+        alias = getattr(settings, self.l2_setting)
+        return caches[alias] if alias else None
+
+    def get(self, key):
+        """
+        @returns the cached value, or None if not cached
+
+        """
+
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > now:
+                self.entries.move_to_end(key)
+                self.lookups.increment(('l1_hit',))
+                return entry[1]
+        l2_cache = self.get_l2_cache()
+        if l2_cache is not None:
+            value = l2_cache.get(self.get_cache_key(key))
+            if value is not None:
+                self.set_l1(key, value)
+                self.lookups.increment(('l2_hit',))
+                return value
+        self.lookups.increment(('miss',))
+        return None
+
+    def set_l1(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.timeout, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > getattr(settings, self.maxsize_setting):
+                self.entries.popitem(last=False)
+
+    def set(self, key, value):
+        if self.timeout <= 0:
+            return
+        self.set_l1(key, value)
+        l2_cache = self.get_l2_cache()
+        if l2_cache is not None:
+            l2_cache.set(self.get_cache_key(key), value, timeout=self.timeout)
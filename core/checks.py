@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.core import checks
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.module_loading import import_string
+
+
+MIDDLEWARE_HOOKS = (
+    'process_request',
+    'process_view',
+    'process_template_response',
+    'process_response',
+    'process_exception',
+)
+
+
+@checks.register('middleware')
+def check_middleware(app_configs, **kwargs):
+    """
+    Flag entries in settings.MIDDLEWARE that run more than once, and
+    MiddlewareMixin subclasses that define no hooks and therefore do nothing
+    but add a layer to every request.
+
+    """
+
+    errors = []
+    seen = set()
+    for path in settings.MIDDLEWARE:
+        if path in seen:
+            errors.append(checks.Warning(
+                f'{path} is listed more than once in MIDDLEWARE.',
+                hint='Remove the duplicate entry.',
+                id='core.W001',
+            ))
+        seen.add(path)
+
+        middleware = import_string(path)
+        if (
+            isinstance(middleware, type)
+            and issubclass(middleware, MiddlewareMixin)
+            and middleware.__call__ is MiddlewareMixin.__call__
+            and not any(hasattr(middleware, hook) for hook in MIDDLEWARE_HOOKS)
+        ):
+            errors.append(checks.Warning(
+                f'{path} defines no middleware hooks, so it has no effect.',
+                hint='Remove it from MIDDLEWARE.',
+                id='core.W002',
+            ))
+    return errors
@@ -0,0 +1,9 @@
+import pytest
+
+from core.views import PingDomView
+
+
+@pytest.fixture(autouse=True)
+def reset_pingdom_cache():
+    yield
+    PingDomView.cache = None
@@ -0,0 +1,35 @@
+from functools import partial, wraps
+import operator
+
+from directory_components import context_processors
+
+from django.utils.functional import SimpleLazyObject
+
+
+def lazy(processor, keys):
+    """
+    Wraps a context processor so it only runs, once per request, when a
+    template reads one of its values. Templates served from the fragment
+    cache then skip the processors only the fragment used.
+
+    @param {callable} processor - context processor
+    @param {list} keys - the keys the processor returns
+
+    """
+
+    @wraps(processor)
+    def lazy_processor(request):
+        values = SimpleLazyObject(partial(processor, request))
+        return {key: SimpleLazyObject(partial(operator.getitem, values, key)) for key in keys}
+    return lazy_processor
+
+
+sso_processor = lazy(
+    context_processors.sso_processor,
+    keys=['sso_user', 'sso_is_logged_in', 'sso_login_url', 'sso_register_url', 'sso_logout_url', 'sso_profile_url'],
+)
+urls_processor = lazy(context_processors.urls_processor, keys=['services_urls'])
+header_footer_processor = lazy(context_processors.header_footer_processor, keys=['magna_header', 'header_footer_urls'])
+feature_flags = lazy(context_processors.feature_flags, keys=['features'])
+analytics = lazy(context_processors.analytics, keys=['directory_components_analytics'])
+cookie_notice = lazy(context_processors.cookie_notice, keys=['directory_components_cookie_notice'])
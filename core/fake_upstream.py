@@ -0,0 +1,414 @@
+"""
+A stand-in for directory-api, SSO and Companies House, for load testing
+this service without the real upstreams. Each service is served under a
+path prefix of its own on the same port, e.g., directory-api under
+/directory-api/.
+
+The profiles returned depend on the SSO session id: a session id containing
+'no-company' has no company, and one containing 'unverified' has an
+unverified company. Any other session id is the verified owner of a company.
+
+"""
+
+from functools import partial
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import hashlib
+import json
+import logging
+import math
+import random
+import re
+import time
+from urllib.parse import parse_qs, urlencode, urlparse
+
+
+logger = logging.getLogger(__name__)
+
+SERVICES = ('directory-api', 'sso', 'companies-house')
+
+MESSAGE_INVALID_LATENCY = (
+    'Invalid latency "{spec}". Expected one of fixed:MS, uniform:MIN_MS:MAX_MS, '
+    'normal:MEAN_MS:STDDEV_MS, lognormal:MEDIAN_MS:SIGMA or exponential:MEAN_MS'
+)
+MESSAGE_INVALID_ERROR_RATE = 'Invalid error rate "{spec}". Expected a fraction between 0 and 1'
+MESSAGE_UNKNOWN_SERVICE = 'Unknown service "{service}". Expected one of {services}'
+
+CSV_DUMP_HEADER = b'company_name,company_number,email_address,sector\n'
+CSV_DUMP_CHUNK_SIZE = 64 * 1024
+
+
+def parse_latency(spec, rng=random):
+    """
+    @param {str} spec - e.g., 'lognormal:40:0.5'. Times are in milliseconds.
+    @returns callable - takes no arguments, returns a delay in seconds
+    @raises ValueError - the spec is not understood
+
+    """
+
+    name, _, arguments = spec.partition(':')
+    try:
+        values = [float(value) for value in arguments.split(':')]
+    except ValueError:
+        raise ValueError(MESSAGE_INVALID_LATENCY.format(spec=spec))
+    if name == 'fixed' and len(values) == 1:
+        delay = values[0] / 1000
+        sample = partial(float, delay)
+    elif name == 'uniform' and len(values) == 2:
+        low, high = values[0] / 1000, values[1] / 1000
+        sample = partial(rng.uniform, low, high)
+    elif name == 'normal' and len(values) == 2:
+        mean, stddev = values[0] / 1000, values[1] / 1000
+        sample = partial(rng.gauss, mean, stddev)
+    elif name == 'lognormal' and len(values) == 2 and values[0] > 0:
+        median, sigma = values[0] / 1000, values[1]
+        # the median of lognormvariate(mu, sigma) is e ** mu
+        sample = partial(rng.lognormvariate, math.log(median), sigma)
+    elif name == 'exponential' and len(values) == 1 and values[0] > 0:
+        mean = values[0] / 1000
+        sample = partial(rng.expovariate, 1 / mean)
+    else:
+        raise ValueError(MESSAGE_INVALID_LATENCY.format(spec=spec))
+    return lambda: max(sample(), 0)
+
+
+def parse_error_rate(spec):
+    try:
+        error_rate = float(spec)
+    except ValueError:
+        error_rate = -1
+    if not 0 <= error_rate <= 1:
+        raise ValueError(MESSAGE_INVALID_ERROR_RATE.format(spec=spec))
+    return error_rate
+
+
+def parse_per_service(specs, parse):
+    """
+    Parse options given either for every service, e.g., 'fixed:20', or for
+    one, e.g., 'sso=fixed:20'. Options for one service take precedence.
+
+    @returns dict - parsed values keyed by service name
+
+    """
+
+    default = None
+    values = {}
+    for spec in specs:
+        service, separator, value = spec.rpartition('=')
+        if not separator:
+            default = parse(value)
+        elif service not in SERVICES:
+            raise ValueError(MESSAGE_UNKNOWN_SERVICE.format(service=service, services=', '.join(SERVICES)))
+        else:
+            values[service] = parse(value)
+    return {service: values.get(service, default) for service in SERVICES}
+
+
+class FakeUpstreamConfig:
+
+    def __init__(
+        self, latency=None, error_rate=None, error_status=HTTPStatus.SERVICE_UNAVAILABLE,
+        profile_padding=0, csv_dump_size=1024 * 1024, search_results=20, rng=random,
+    ):
+        """
+        @param {dict} latency - delay samplers keyed by service name
+        @param {dict} error_rate - fraction of requests to fail keyed by
+                                   service name
+        @param {int} profile_padding - bytes added to the company description
+        @param {int} csv_dump_size - approximate bytes in each CSV dump
+
+        """
+
+        self.latency = latency or {}
+        self.error_rate = error_rate or {}
+        self.error_status = error_status
+        self.profile_padding = profile_padding
+        self.csv_dump_size = csv_dump_size
+        self.search_results = search_results
+        self.rng = rng
+
+    def get_delay(self, service):
+        sample = self.latency.get(service)
+        return sample() if sample else 0
+
+    def should_fail(self, service):
+        error_rate = self.error_rate.get(service) or 0
+        return error_rate > 0 and self.rng.random() < error_rate
+
+
+def get_session_id(headers, params):
+    authorization = headers.get('Authorization', '')
+    if authorization.startswith('SSO_SESSION_ID '):
+        return authorization[len('SSO_SESSION_ID '):]
+    return params.get('session_key', [''])[0]
+
+
+def get_user_id(session_id):
+    return int(hashlib.sha256(session_id.encode()).hexdigest()[:8], 16)
+
+
+def build_session_user(session_id):
+    user_id = get_user_id(session_id)
+    return {
+        'id': user_id,
+        'hashed_uuid': hashlib.sha256(str(user_id).encode()).hexdigest(),
+        'email': f'user-{user_id}@example.com',
+        'user_profile': {
+            'first_name': 'Jeremy',
+            'last_name': 'Fake',
+            'job_title': 'Director',
+            'mobile_phone_number': '07507694377',
+        },
+    }
+
+
+def build_company_number(session_id):
+    return f'{get_user_id(session_id) % 100000000:08d}'
+
+
+def build_company(session_id, padding=0):
+    return {
+        'address_line_1': '123 Fake Street',
+        'address_line_2': 'Fakeville',
+        'country': 'GB',
+        'date_of_creation': '2015-03-02',
+        'description': 'Ecommerce website' + ' ' * padding,
+        'email_address': 'test@example.com',
+        'email_full_name': 'Jeremy',
+        'employees': '501-1000',
+        'facebook_url': 'http://www.facebook.com',
+        'has_valid_address': True,
+        'is_published': True,
+        'is_verification_letter_sent': False,
+        'keywords': 'word1, word2',
+        'linkedin_url': 'http://www.linkedin.com',
+        'locality': 'London',
+        'logo': 'nice.jpg',
+        'mobile_number': '07507694377',
+        'modified': '2016-11-23T11:21:10.977518Z',
+        'name': 'Great company',
+        'number': build_company_number(session_id),
+        'po_box': '',
+        'postal_code': 'E14 6XK',
+        'postal_full_name': 'Jeremy',
+        'sectors': ['SECURITY'],
+        'summary': 'good',
+        'supplier_case_studies': [],
+        'twitter_url': 'http://www.twitter.com',
+        'verified_with_code': 'unverified' not in session_id,
+        'verified_with_companies_house_oauth2': False,
+        'verified_with_preverified_enrolment': False,
+        'is_verified': 'unverified' not in session_id,
+        'website': 'http://example.com',
+    }
+
+
+def build_supplier(session_id):
+    has_company = 'no-company' not in session_id
+    return {
+        'company': get_user_id(session_id) if has_company else None,
+        'company_email': 'test@example.com',
+        'sso_id': get_user_id(session_id),
+        'is_company_owner': has_company,
+    }
+
+
+def build_companies_house_profile(number):
+    return {
+        'company_name': 'Great company',
+        'company_number': number,
+        'company_status': 'active',
+        'date_of_creation': '2015-03-02',
+        'registered_office_address': build_companies_house_address(),
+        'sic_codes': ['62020'],
+    }
+
+
+def build_companies_house_address():
+    return {
+        'address_line_1': '123 Fake Street',
+        'address_line_2': 'Fakeville',
+        'locality': 'London',
+        'postal_code': 'E14 6XK',
+        'country': 'United Kingdom',
+    }
+
+
+def iter_csv_dump(size):
+    yield CSV_DUMP_HEADER
+    row_number = 0
+    remaining = size - len(CSV_DUMP_HEADER)
+    while remaining > 0:
+        rows = []
+        chunk_length = 0
+        while chunk_length < CSV_DUMP_CHUNK_SIZE and remaining - chunk_length > 0:
+            row = f'Company {row_number},{row_number:08d},company-{row_number}@example.com,SECURITY\n'.encode()
+            rows.append(row)
+            chunk_length += len(row)
+            row_number += 1
+        chunk = b''.join(rows)
+        remaining -= len(chunk)
+        yield chunk
+
+
+class FakeUpstreamHandler(BaseHTTPRequestHandler):
+    # keep connections alive, as the real upstreams do, so pooled sessions
+    # reuse them
+    protocol_version = 'HTTP/1.1'
+
+    # (service, method, path pattern, handler name)
+    routes = [
+        ('directory-api', 'GET', r'/supplier/company/', 'get_company'),
+        ('directory-api', 'PATCH', r'/supplier/company/', 'update_company'),
+        ('directory-api', 'POST', r'/supplier/company/verify/', 'verify_company'),
+        ('directory-api', 'POST', r'/supplier/company/verify/companies-house/', 'verify_company'),
+        ('directory-api', 'POST', r'/supplier/unsubscribe/', 'unsubscribe'),
+        ('directory-api', 'GET', r'/(?P<name>buyer|supplier)/csv-dump/', 'get_csv_dump'),
+        ('directory-api', 'GET', r'/supplier/[^/]+/', 'get_supplier'),
+        ('directory-api', 'GET', r'/healthcheck/ping/', 'ping'),
+        ('sso', 'GET', r'/api/v1/session-user/', 'get_session_user'),
+        ('sso', 'GET', r'/api/v1/healthcheck/ping/', 'ping'),
+        ('companies-house', 'GET', r'/company/(?P<number>[^/]+)', 'get_companies_house_profile'),
+        ('companies-house', 'GET', r'/company/[^/]+/registered-office-address', 'get_companies_house_address'),
+        ('companies-house', 'GET', r'/search/companies', 'search_companies_house'),
+        ('companies-house', 'GET', r'/oauth2/authorise', 'authorise_oauth2'),
+        ('companies-house', 'POST', r'/oauth2/token', 'get_oauth2_token'),
+    ]
+
+    @property
+    def config(self):
+        return self.server.config
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+    def do_GET(self):
+        self.dispatch('GET')
+
+    def do_POST(self):
+        self.dispatch('POST')
+
+    def do_PATCH(self):
+        self.dispatch('PATCH')
+
+    def resolve(self, method, path):
+        for service, route_method, pattern, handler_name in self.routes:
+            match = re.fullmatch(f'/{re.escape(service)}{pattern}', path)
+            if match and route_method == method:
+                return service, getattr(self, handler_name), match.groupdict()
+        return None, None, {}
+
+    def dispatch(self, method):
+        url = urlparse(self.path)
+        self.params = parse_qs(url.query)
+        # the body is read so the connection can be reused
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        service, handler, kwargs = self.resolve(method, url.path)
+        if handler is None:
+            self.send_json(HTTPStatus.NOT_FOUND, {'detail': 'Not found.'})
+            return
+        time.sleep(self.config.get_delay(service))
+        if self.config.should_fail(service):
+            self.send_json(self.config.error_status, {'detail': 'Injected error.'})
+            return
+        self.session_id = get_session_id(self.headers, self.params)
+        handler(**kwargs)
+
+    def send_body(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, status, data):
+        self.send_body(status, json.dumps(data).encode(), 'application/json')
+
+    def get_company(self):
+        if 'no-company' in self.session_id:
+            self.send_json(HTTPStatus.NOT_FOUND, {'detail': 'Not found.'})
+        else:
+            self.send_json(HTTPStatus.OK, build_company(self.session_id, padding=self.config.profile_padding))
+
+    def update_company(self):
+        self.get_company()
+
+    def verify_company(self):
+        self.send_json(HTTPStatus.OK, {})
+
+    def unsubscribe(self):
+        self.send_json(HTTPStatus.OK, {})
+
+    def get_supplier(self):
+        self.send_json(HTTPStatus.OK, build_supplier(self.session_id))
+
+    def ping(self):
+        self.send_json(HTTPStatus.OK, {'status_code': HTTPStatus.OK})
+
+    def get_csv_dump(self, name):
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', 'text/csv')
+        self.send_header('Content-Disposition', f'attachment; filename="find-a-buyer_{name}s.csv"')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for chunk in iter_csv_dump(self.config.csv_dump_size):
+            self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+        self.wfile.write(b'0\r\n\r\n')
+
+    def get_session_user(self):
+        if not self.session_id:
+            self.send_json(HTTPStatus.NOT_FOUND, {'detail': 'Not found.'})
+        else:
+            self.send_json(HTTPStatus.OK, build_session_user(self.session_id))
+
+    def get_companies_house_profile(self, number):
+        self.send_json(HTTPStatus.OK, build_companies_house_profile(number))
+
+    def get_companies_house_address(self):
+        self.send_json(HTTPStatus.OK, build_companies_house_address())
+
+    def search_companies_house(self):
+        query = self.params.get('q', [''])[0]
+        items = [
+            {**build_companies_house_profile(f'{number:08d}'), 'title': f'{query} {number}'.strip()}
+            for number in range(self.config.search_results)
+        ]
+        self.send_json(HTTPStatus.OK, {'items': items, 'total_results': len(items)})
+
+    def authorise_oauth2(self):
+        # skip the consent screen and send the user straight back
+        redirect_uri = self.params.get('redirect_uri', [''])[0]
+        location = redirect_uri + '?' + urlencode({'code': 'fake-oauth2-code'})
+        self.send_body(HTTPStatus.FOUND, b'', 'text/plain', headers={'Location': location})
+
+    def get_oauth2_token(self):
+        self.send_json(HTTPStatus.OK, {
+            'access_token': 'fake-access-token',
+            'token_type': 'Bearer',
+            'expires_in': 3600,
+            'refresh_token': 'fake-refresh-token',
+        })
+
+
+class FakeUpstreamServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, config):
+        self.config = config
+        super().__init__(address, FakeUpstreamHandler)
+
+    def get_base_urls(self, host=None):
+        """
+        @returns dict - the settings that point this service at the fake
+
+        """
+
+        base_url = f'http://{host or self.server_address[0]}:{self.server_address[1]}'
+        return {
+            'DIRECTORY_API_CLIENT_BASE_URL': f'{base_url}/directory-api/',
+            'DIRECTORY_SSO_API_CLIENT_BASE_URL': f'{base_url}/sso/',
+            'COMPANIES_HOUSE_API_URL': f'{base_url}/companies-house/',
+            'COMPANIES_HOUSE_URL': f'{base_url}/companies-house/',
+        }
@@ -0,0 +1,365 @@
+import bisect
+from functools import wraps
+import logging
+import threading
+import time
+import types
+
+import requests
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.core.handlers.exception import convert_exception_to_response
+from django.core.handlers.wsgi import WSGIHandler
+from django.utils.module_loading import import_string
+
+
+logger = logging.getLogger(__name__)
+
+HOOK_PHASES = {
+    'process_view': 'view',
+    'process_template_response': 'template_response',
+    'process_exception': 'exception',
+}
+
+
+class Histogram:
+    # upper bounds in seconds, in the style of a prometheus histogram
+    buckets = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, float('inf'))
+
+    def __init__(self):
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """@returns the upper bound of the bucket the `q` quantile falls in"""
+
+        rank = q * self.count
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            if total >= rank:
+                return bound
+        return self.buckets[-1]
+
+    def as_dict(self):
+        cumulative = []
+        total = 0
+        for count in self.counts:
+            total += count
+            cumulative.append(total)
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'buckets': dict(zip(self.buckets, cumulative)),
+        }
+
+
+class Histograms:
+    """Thread-safe histograms keyed by an arbitrary tuple of labels."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+
+    def observe(self, key, value):
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram()
+            self.histograms[key].observe(value)
+
+    def snapshot(self):
+        with self.lock:
+            return {key: histogram.as_dict() for key, histogram in self.histograms.items()}
+
+    def summary(self):
+        with self.lock:
+            return ', '.join(
+                f'{" ".join(key)}: n={histogram.count} mean={histogram.sum / histogram.count * 1000:.3f}ms '
+                f'p99<={histogram.quantile(0.99) * 1000:g}ms'
+                for key, histogram in sorted(self.histograms.items())
+            )
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+
+
+class Counters:
+    """Thread-safe monotonic counters keyed by an arbitrary tuple of labels."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+
+    def increment(self, key, value=1):
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.counters)
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+
+
+# (middleware path, phase) -> Histogram
+middleware_timings = Histograms()
+
+# (service, endpoint) -> Histogram
+outbound_timings = Histograms()
+# (service, endpoint, status class) -> number of calls
+outbound_calls = Counters()
+# (service, endpoint) -> response body bytes
+outbound_bytes = Counters()
+
+# (result,) -> number of SSO session lookups: 'l1_hit', 'l2_hit' or 'miss'
+sso_session_lookups = Counters()
+# (result,) -> number of template fragment cache lookups, as above
+fragment_cache_lookups = Counters()
+
+# (validator name,) -> Histogram of form validators run by
+# company.helpers.halt_validation_on_failure
+validator_timings = Histograms()
+
+# (owner, attribute name, service, endpoint) of every method known to make an
+# outbound call, so tests can count calls to them even when they are mocked
+outbound_methods = []
+# callables told the (service, endpoint) of every outbound call as it starts
+outbound_call_listeners = []
+
+
+def get_status_class(response):
+    status_code = getattr(response, 'status_code', None)
+    if isinstance(status_code, int):
+        return f'{status_code // 100}xx'
+    return 'unknown'
+
+
+def get_response_size(response):
+    if isinstance(response, requests.Response) and response._content is False:
+        # a streamed body: reading `content` would buffer all of it
+        return int(response.headers.get('Content-Length', 0))
+    content = getattr(response, 'content', None)
+    return len(content) if isinstance(content, (bytes, str)) else 0
+
+
+def record_outbound_call(service, endpoint):
+    """
+    Decorate a function that makes an upstream call and returns a
+    requests.Response, recording its latency, status class and body size.
+    Calls that raise are counted with the status class 'error'.
+
+    """
+
+    def decorator(function):
+        @wraps(function)
+        def inner(*args, **kwargs):
+            for listener in outbound_call_listeners:
+                listener(service, endpoint)
+            start_time = time.perf_counter()
+            try:
+                response = function(*args, **kwargs)
+            except Exception:
+                outbound_calls.increment((service, endpoint, 'error'))
+                raise
+            finally:
+                outbound_timings.observe((service, endpoint), time.perf_counter() - start_time)
+            outbound_calls.increment((service, endpoint, get_status_class(response)))
+            outbound_bytes.increment((service, endpoint), get_response_size(response))
+            return response
+        return inner
+    return decorator
+
+
+def register_outbound_method(owner, name, service, endpoint):
+    outbound_methods.append((owner, name, service, endpoint))
+
+
+def instrument_api_client(client, service, prefix=''):
+    """
+    Record every public method a directory client class defines, e.g.,
+    `api_client.company.profile_retrieve` as endpoint
+    'company.profile_retrieve'. The methods are wrapped on the instance, so
+    tests can still patch them.
+
+    """
+
+    for name, value in vars(type(client)).items():
+        if not name.startswith('_') and callable(value) and not isinstance(value, (type, staticmethod)):
+            endpoint = f'{prefix}{name}'
+            setattr(client, name, record_outbound_call(service, endpoint)(getattr(client, name)))
+            register_outbound_method(client, name, service, endpoint)
+
+
+def instrument_api_clients():
+    from directory_api_client.base import AbstractAPIClient
+    from directory_api_client.client import api_client
+    from directory_sso_api_client import sso_api_client
+
+    instrument_api_client(api_client, service='directory-api')
+    for name, client in vars(api_client).items():
+        if isinstance(client, AbstractAPIClient):
+            instrument_api_client(client, service='directory-api', prefix=f'{name}.')
+    instrument_api_client(sso_api_client.user, service='sso', prefix='user.')
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(**labels):
+    return '{' + ','.join(f'{name}="{escape_label(value)}"' for name, value in labels.items()) + '}'
+
+
+def format_histogram(name, label_names, histograms):
+    lines = [f'# TYPE {name} histogram']
+    for key, histogram in sorted(histograms.snapshot().items()):
+        labels = dict(zip(label_names, key))
+        for bound, count in histogram['buckets'].items():
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            lines.append(f'{name}_bucket{format_labels(**labels, le=le)} {count}')
+        lines.append(f'{name}_sum{format_labels(**labels)} {histogram["sum"]}')
+        lines.append(f'{name}_count{format_labels(**labels)} {histogram["count"]}')
+    return lines
+
+
+def format_counter(name, label_names, counters):
+    lines = [f'# TYPE {name} counter']
+    for key, value in sorted(counters.snapshot().items()):
+        lines.append(f'{name}{format_labels(**dict(zip(label_names, key)))} {value}')
+    return lines
+
+
+def render_prometheus():
+    """
+    @returns str - the metrics of this process in the prometheus text format
+
+    """
+
+    from enrolment.helpers import CompaniesHouseClient
+
+    lines = [
+        *format_histogram('outbound_request_duration_seconds', ['service', 'endpoint'], outbound_timings),
+        *format_counter('outbound_requests_total', ['service', 'endpoint', 'status_class'], outbound_calls),
+        *format_counter('outbound_response_bytes_total', ['service', 'endpoint'], outbound_bytes),
+        *format_histogram('middleware_duration_seconds', ['middleware', 'phase'], middleware_timings),
+        *format_histogram('form_validator_duration_seconds', ['validator'], validator_timings),
+        *format_counter('sso_session_lookups_total', ['result'], sso_session_lookups),
+        *format_counter('template_fragment_cache_lookups_total', ['result'], fragment_cache_lookups),
+    ]
+    pool_metrics = CompaniesHouseClient.get_pool_metrics()
+    for metric in ['connections_opened', 'requests', 'pool_available', 'pool_maxsize']:
+        name = f'companies_house_pool_{metric}'
+        lines.append(f'# TYPE {name} gauge')
+        for host, values in sorted(pool_metrics['pools'].items()):
+            lines.append(f'{name}{format_labels(host=host)} {values[metric]}')
+    return '\n'.join(lines) + '\n'
+
+
+class TimedMiddleware:
+    """
+    Wraps a middleware to record how long it spends handling the request
+    before calling the next layer, and the response after that layer returns.
+    Time spent in the layers below is not counted. Hooks the middleware
+    defines, e.g., process_template_response, are timed as phases of their own.
+
+    """
+
+    def __init__(self, path, middleware, get_response):
+        self.path = path
+        self.get_response = get_response
+        self.middleware = middleware(self.get_inner_response)
+        for hook, phase in HOOK_PHASES.items():
+            if hasattr(self.middleware, hook):
+                setattr(self, hook, self.time_hook(getattr(self.middleware, hook), phase))
+
+    def time_hook(self, method, phase):
+        def inner(middleware, *args, **kwargs):
+            start_time = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                middleware_timings.observe((self.path, phase), time.perf_counter() - start_time)
+        # bound to the wrapped middleware, as django names it in errors
+        return types.MethodType(inner, self.middleware)
+
+    def get_inner_response(self, request):
+        timing = request._middleware_timing[self.path]
+        timing['inner_start'] = time.perf_counter()
+        try:
+            return self.get_response(request)
+        finally:
+            timing['inner_end'] = time.perf_counter()
+
+    def __call__(self, request):
+        if not hasattr(request, '_middleware_timing'):
+            request._middleware_timing = {}
+        timing = request._middleware_timing[self.path] = {}
+        start_time = time.perf_counter()
+        try:
+            return self.middleware(request)
+        finally:
+            end_time = time.perf_counter()
+            if 'inner_start' in timing:
+                middleware_timings.observe((self.path, 'request'), timing['inner_start'] - start_time)
+                middleware_timings.observe((self.path, 'response'), end_time - timing['inner_end'])
+            else:
+                # the middleware answered without calling the next layer
+                middleware_timings.observe((self.path, 'request'), end_time - start_time)
+
+
+class MiddlewareTimingMixin:
+    """
+    Handler that wraps every entry in settings.MIDDLEWARE in TimedMiddleware
+    and logs a summary of the timings every MIDDLEWARE_TIMING_LOG_INTERVAL
+    requests.
+
+    This mirrors BaseHandler.load_middleware for synchronous handlers only,
+    which is all a WSGI deployment uses.
+
+    """
+
+    request_count = 0
+
+    def load_middleware(self, is_async=False):
+        if is_async:
+            raise ImproperlyConfigured('Middleware timing supports synchronous handlers only.')
+        self._view_middleware = []
+        self._template_response_middleware = []
+        self._exception_middleware = []
+
+        handler = convert_exception_to_response(self._get_response)
+        for middleware_path in reversed(settings.MIDDLEWARE):
+            middleware = import_string(middleware_path)
+            try:
+                mw_instance = TimedMiddleware(middleware_path, middleware, handler)
+            except MiddlewareNotUsed:
+                continue
+            if hasattr(mw_instance, 'process_view'):
+                self._view_middleware.insert(0, mw_instance.process_view)
+            if hasattr(mw_instance, 'process_template_response'):
+                self._template_response_middleware.append(mw_instance.process_template_response)
+            if hasattr(mw_instance, 'process_exception'):
+                self._exception_middleware.append(mw_instance.process_exception)
+            handler = convert_exception_to_response(mw_instance)
+        self._middleware_chain = handler
+
+    def get_response(self, request):
+        response = super().get_response(request)
+        self.request_count += 1
+        if self.request_count % settings.MIDDLEWARE_TIMING_LOG_INTERVAL == 0:
+            logger.info('Middleware timings: %s', middleware_timings.summary())
+        return response
+
+
+class TimedWSGIHandler(MiddlewareTimingMixin, WSGIHandler):
+    pass
@@ -0,0 +1,71 @@
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import fake_upstream
+
+
+class Command(BaseCommand):
+    help = (
+        'Serve a stand-in for directory-api, SSO and Companies House with '
+        'injected latency and errors, for load testing without the upstreams.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8010)
+        parser.add_argument(
+            '--latency', action='append', default=[], metavar='[SERVICE=]DISTRIBUTION',
+            help=(
+                'Delay before each response, in milliseconds: fixed:MS, uniform:MIN:MAX, '
+                'normal:MEAN:STDDEV, lognormal:MEDIAN:SIGMA or exponential:MEAN. '
+                'Repeat to set it per service, e.g., --latency sso=fixed:20'
+            ),
+        )
+        parser.add_argument(
+            '--error-rate', action='append', default=[], metavar='[SERVICE=]FRACTION',
+            help='Fraction of requests answered with --error-status, e.g., --error-rate directory-api=0.01',
+        )
+        parser.add_argument('--error-status', type=int, default=503)
+        parser.add_argument(
+            '--profile-padding', type=int, default=0,
+            help='Bytes added to each company profile',
+        )
+        parser.add_argument(
+            '--csv-dump-size', type=int, default=1024 * 1024,
+            help='Approximate bytes in each buyer and supplier CSV dump',
+        )
+        parser.add_argument(
+            '--search-results', type=int, default=20,
+            help='Companies returned by each Companies House search',
+        )
+        parser.add_argument('--seed', type=int, help='Seed the random latency and errors for repeatable runs')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        try:
+            latency = fake_upstream.parse_per_service(
+                options['latency'], lambda spec: fake_upstream.parse_latency(spec, rng=rng)
+            )
+            error_rate = fake_upstream.parse_per_service(options['error_rate'], fake_upstream.parse_error_rate)
+        except ValueError as error:
+            raise CommandError(str(error))
+        config = fake_upstream.FakeUpstreamConfig(
+            latency=latency,
+            error_rate=error_rate,
+            error_status=options['error_status'],
+            profile_padding=options['profile_padding'],
+            csv_dump_size=options['csv_dump_size'],
+            search_results=options['search_results'],
+            rng=rng,
+        )
+        server = fake_upstream.FakeUpstreamServer((options['host'], options['port']), config)
+        self.stdout.write('Serving fake upstreams. Point this service at them with:')
+        for name, value in server.get_base_urls().items():
+            self.stdout.write(f'{name}={value}')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.templating import precompile_templates
+
+
+class Command(BaseCommand):
+    help = 'Parse every template into the cached loader and report how long each took.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--slowest', type=int, default=0,
+            help='Only report this many of the slowest templates',
+        )
+
+    def handle(self, *args, **options):
+        timings = precompile_templates()
+        ranked = sorted(timings, key=lambda timing: timing[1], reverse=True)
+        if options['slowest']:
+            ranked = ranked[:options['slowest']]
+        for name, seconds, error in ranked:
+            line = f'{seconds * 1000:8.2f} ms  {name}'
+            self.stdout.write(self.style.ERROR(f'{line}  {error}') if error else line)
+        total = sum(seconds for name, seconds, error in timings)
+        self.stdout.write(f'{len(timings)} templates parsed in {total * 1000:.2f} ms')
+        errors = [name for name, seconds, error in timings if error]
+        if errors:
+            raise CommandError(f'{len(errors)} templates failed to parse: {", ".join(errors)}')
@@ -1,25 +1,139 @@
 from django.utils import translation
 from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.urls import URLResolver, get_resolver, resolve
+from django.utils.regex_helper import normalize
 from django.utils.deprecation import MiddlewareMixin
+from django.utils.module_loading import import_string
 
 from directory_components.middleware import AbstractPrefixUrlMiddleware
 
+from core import redirects
+from core.policies import CachePolicy, no_store
+
 
 class PrefixUrlMiddleware(AbstractPrefixUrlMiddleware):
     prefix = '/find-a-buyer/'
 
 
+class LegacyRedirectMiddleware(MiddlewareMixin):
+    """
+    Redirects the retired urls listed in settings.LEGACY_REDIRECTS before
+    the session, the SSO user or the url resolver are touched. The paths
+    are matched with or without the url prefix.
+
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.table = redirects.RedirectTable(import_string(settings.LEGACY_REDIRECTS))
+        self.cache_policy = CachePolicy(public=True, max_age=settings.LEGACY_REDIRECT_CACHE_MAX_AGE)
+
+    def process_request(self, request):
+        path = request.path_info
+        if path.startswith(PrefixUrlMiddleware.prefix):
+            path = path[len(PrefixUrlMiddleware.prefix):]
+        else:
+            path = path[1:]
+        redirect = self.table.get(path)
+        if redirect is not None:
+            response = redirects.get_response(redirect)
+            self.cache_policy.patch_response(response)
+            return response
+
+
+def get_literal_path(pattern):
+    """@returns str - the only path `pattern` matches, or None"""
+
+    possibilities = normalize(pattern.regex.pattern)
+    if len(possibilities) != 1:
+        return None
+    path, params = possibilities[0]
+    return None if params else path.replace('%%', '%')
+
+
+def iter_anonymous_paths(url_patterns, prefix='/'):
+    """
+    @returns generator - the paths of the views marked `anonymous_only`
+
+    """
+
+    for url_pattern in url_patterns:
+        path = get_literal_path(url_pattern.pattern)
+        if isinstance(url_pattern, URLResolver):
+            if path is not None:
+                yield from iter_anonymous_paths(url_pattern.url_patterns, prefix + path)
+        elif getattr(url_pattern.callback, 'anonymous_only', False):
+            if path is None:
+                raise ImproperlyConfigured(f'{url_pattern} is anonymous_only, so it needs a fixed path.')
+            yield prefix + path
+
+
+class AnonymousRouteMiddleware(MiddlewareMixin):
+    """
+    Serves the views marked with `core.policies.anonymous_only` directly,
+    skipping the middleware below this one and the view middleware.
+
+    Their paths are collected from the urlconf at startup, so the other
+    requests are not resolved here as well as by the handler.
+
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.paths = frozenset(iter_anonymous_paths(get_resolver().url_patterns))
+
+    def process_request(self, request):
+        if request.path_info not in self.paths:
+            return None
+        match = resolve(request.path_info)
+        request.resolver_match = match
+        response = match.func(request, *match.args, **match.kwargs)
+        if hasattr(response, 'render') and callable(response.render):
+            response = response.render()
+        return response
+
+
+class CachePolicyMiddleware(MiddlewareMixin):
+    """
+    Keeps the responses of authenticated users out of every cache, unless
+    the route declared a `core.policies.CachePolicy`.
+
+    """
+
+    def process_response(self, request, response):
+        if request.user.is_authenticated:
+            no_store.patch_response(response)
+        return response
+
+
 class GA360Middleware(MiddlewareMixin):
 
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        # the fields that do not depend on the user are built once per
+        # language rather than on every response
+        self.static_payloads = {}
+        self.get_static_payload(settings.LANGUAGE_CODE)
+
+    def get_static_payload(self, language):
+        try:
+            return self.static_payloads[language]
+        except KeyError:
+            payload = self.static_payloads[language] = {
+                'page_id': '',
+                'business_unit': settings.GA360_BUSINESS_UNIT,
+                'site_language': language,
+                'site_section': settings.GA360_SITE_SECTION,
+                'site_subsection': '',
+            }
+            return payload
+
     def process_template_response(self, request, response):
+        if getattr(request, 'skip_ga360', False):
+            return response
 
-        ga360_payload = {
-            'page_id': '',
-            'business_unit': settings.GA360_BUSINESS_UNIT,
-            'site_language': translation.get_language(),
-            'site_section': settings.GA360_SITE_SECTION,
-            'site_subsection': '',
-        }
+        ga360_payload = {**self.get_static_payload(translation.get_language())}
 
         if request.user.is_authenticated:
             ga360_payload['user_id'] = str(request.user.hashed_uuid)
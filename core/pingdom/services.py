@@ -1,22 +1,70 @@
-from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, wait
+import time
 
 from django.conf import settings
+from django.utils.functional import SimpleLazyObject
 from redis import Redis
-from redis.exceptions import ConnectionError
+from redis.exceptions import ConnectionError, TimeoutError
+
+
+MESSAGE_TIMED_OUT = '{name} check did not finish within {timeout} seconds'
+
+
+# shared by every probe, so a ping reuses a pooled connection instead of
+# opening a new one. redis-py discards the pool's connections after a fork.
+redis_client = SimpleLazyObject(lambda: Redis.from_url(
+    settings.REDIS_URL,
+    socket_timeout=settings.PINGDOM_CHECK_TIMEOUT,
+    socket_connect_timeout=settings.PINGDOM_CHECK_TIMEOUT,
+))
 
 
 class RedisHealthCheck:
     name = 'redis'
+    round_trip_time = None
 
     def check(self):
-        o = urlparse(settings.REDIS_URL)
-        rs = Redis(host=o.hostname, port=o.port, db=0)
+        start_time = time.monotonic()
         try:
-            rs.ping()
-        except (ConnectionError, ConnectionRefusedError) as e:
+            redis_client.ping()
+        except (ConnectionError, ConnectionRefusedError, TimeoutError) as e:
             return False, e
         else:
+            self.round_trip_time = time.monotonic() - start_time
             return True, ''
 
 
 health_check_services = (RedisHealthCheck,)
+
+
+executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='pingdom')
+
+
+def timed_check(service):
+    instance = service()
+    start_time = time.monotonic()
+    status, error = instance.check()
+    elapsed = time.monotonic() - start_time
+    # prefer the latency the check measured itself, e.g., the redis PING
+    return status, error, getattr(instance, 'round_trip_time', None) or elapsed
+
+
+def run_checks(services, timeout):
+    """
+    Run every check at the same time, giving each at most `timeout` seconds.
+    A check that overruns is reported as failed. It keeps running in the
+    background, but is not waited for.
+
+    @returns dict - (status, error, seconds taken) keyed by service name
+
+    """
+
+    futures = {service.name: executor.submit(timed_check, service) for service in services}
+    wait(futures.values(), timeout=timeout)
+    checked = {}
+    for name, future in futures.items():
+        if future.done():
+            checked[name] = future.result()
+        else:
+            checked[name] = (False, MESSAGE_TIMED_OUT.format(name=name, timeout=timeout), timeout)
+    return checked
@@ -0,0 +1,152 @@
+from functools import wraps
+import logging
+import time
+
+from django.contrib.auth.decorators import login_required
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponseRedirect
+from django.shortcuts import resolve_url
+from django.utils.cache import patch_cache_control, patch_vary_headers
+
+
+logger = logging.getLogger(__name__)
+
+
+class Gate:
+    """
+    A single access check: `test` is called with the user and the request is
+    redirected to `redirect_url` if it returns False.
+
+    @param {str} name - used when reporting evaluation time
+    @param {callable} test - takes the user, returns bool
+    @param {str} redirect_url - url or url name
+    @param {tuple} profiles - SSOUser profiles `test` reads, e.g., 'company'
+
+    """
+
+    def __init__(self, name, test, redirect_url, profiles=()):
+        self.name = name
+        self.test = test
+        self.redirect_url = redirect_url
+        self.profiles = tuple(profiles)
+
+
+class AccessPolicy:
+    """
+    Declarative replacement for stacked `user_passes_test` decorators.
+
+    The gates are evaluated in order in one pass, stopping at the first that
+    fails. Every profile the gates read is known up front, so when more than
+    one is needed they are retrieved concurrently before any gate runs. The
+    time each gate took is stored on `request.access_policy_timings`.
+
+    """
+
+    def __init__(self, *gates, login=True):
+        self.gates = gates
+        self.login = login
+        self.profiles = tuple(dict.fromkeys(name for gate in gates for name in gate.profiles))
+
+    def evaluate(self, request):
+        """@returns HttpResponseRedirect for the first failing gate, or None"""
+
+        user = request.user
+        if len(self.profiles) > 1:
+            user.load_profiles(names=self.profiles)
+        timings = request.access_policy_timings = {}
+        try:
+            for gate in self.gates:
+                start_time = time.monotonic()
+                passed = gate.test(user)
+                timings[gate.name] = time.monotonic() - start_time
+                if not passed:
+                    return HttpResponseRedirect(resolve_url(gate.redirect_url))
+        finally:
+            logger.debug('Access policy evaluated in %s', timings)
+
+    def __call__(self, view_func):
+        @wraps(view_func)
+        def inner(request, *args, **kwargs):
+            response = self.evaluate(request)
+            if response is not None:
+                return response
+            return view_func(request, *args, **kwargs)
+        inner.access_policy = self
+        return login_required(inner) if self.login else inner
+
+
+class CachePolicy:
+    """
+    Declares how the responses of a route may be cached, so the CDN can
+    absorb the traffic for those that do not depend on the user.
+
+    Responses of a `public` policy may be stored by shared caches for
+    `max_age` seconds, unless they set a cookie or have a status that
+    should not be reused, in which case they are kept private. Otherwise
+    the responses are private and, with `no_store`, not stored at all. A
+    Cache-Control header already set by the view is left alone.
+
+    @param {bool} public - may be stored by shared caches
+    @param {int} max_age - seconds a public response is fresh for
+    @param {bool} no_store - private responses are not to be stored at all
+    @param {tuple} vary - request headers the response depends on
+    @param {tuple} methods - request methods the policy applies to, or None
+                             for all of them. Responses to any other method
+                             are not stored at all.
+
+    """
+
+    public_status_codes = (200, 301, 302, 404)
+
+    def __init__(self, public=False, max_age=0, no_store=False, vary=(), methods=None):
+        self.public = public
+        self.max_age = max_age
+        self.no_store = no_store
+        self.vary = tuple(vary)
+        self.methods = None if methods is None else tuple(methods)
+
+    def patch_response(self, response):
+        if self.vary:
+            patch_vary_headers(response, self.vary)
+        if response.has_header('Cache-Control'):
+            return
+        if self.public and not response.cookies and response.status_code in self.public_status_codes:
+            patch_cache_control(response, public=True, max_age=self.max_age)
+        elif self.no_store:
+            patch_cache_control(response, private=True, no_store=True, no_cache=True, must_revalidate=True)
+        else:
+            patch_cache_control(response, private=True, no_cache=True)
+
+    def __call__(self, view_func):
+        @wraps(view_func)
+        def inner(request, *args, **kwargs):
+            response = view_func(request, *args, **kwargs)
+            if self.methods is None or request.method in self.methods:
+                self.patch_response(response)
+            else:
+                no_store.patch_response(response)
+            return response
+        inner.cache_policy = self
+        return inner
+
+
+no_store = CachePolicy(no_store=True)
+
+
+def anonymous_only(view_func):
+    """
+    Marks a view that never uses the user or the session, e.g., robots.txt
+    or a probe. AnonymousRouteMiddleware serves it without the middleware
+    below it, so the session is not loaded, the SSO user is not looked up
+    and no GA360 payload is built. `request.user` is always AnonymousUser.
+
+    """
+
+    @wraps(view_func)
+    def inner(request, *args, **kwargs):
+        request.user = AnonymousUser()
+        response = view_func(request, *args, **kwargs)
+        request.skip_ga360 = True
+        return response
+    inner.anonymous_only = True
+    return inner
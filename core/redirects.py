@@ -0,0 +1,109 @@
+from collections import namedtuple
+import re
+
+from django.http import HttpResponsePermanentRedirect, HttpResponseRedirect
+from django.urls import path, re_path
+from django.views.generic import RedirectView
+
+
+Redirect = namedtuple('Redirect', ['path', 'url', 'name', 'prefix', 'permanent'], defaults=[None, False, False])
+Redirect.__doc__ = """
+A retired url and where it now lives.
+
+@param {str} path - relative to the url prefix, e.g., 'company-profile/edit/'.
+                    A segment may be '<int:name>', which matches digits only.
+@param {str} url - the redirect target
+@param {str} name - url name, so the path can still be reversed
+@param {bool} prefix - also redirect every longer path that starts with
+                       `path` and, if `path` does, ends with a slash
+@param {bool} permanent - 301 rather than 302
+
+"""
+
+# trie keys other than path segments
+END = object()
+PREFIX = object()
+INT_SEGMENT = object()
+
+int_segment_pattern = re.compile(r'^<int:\w+>$')
+
+
+class RedirectTable:
+    """
+    The redirects compiled for lookup by path: fixed paths in a dict, and
+    prefixes and paths with an '<int:name>' segment in a trie keyed by path
+    segment, so a lookup costs the same however many redirects there are.
+
+    """
+
+    def __init__(self, redirects):
+        self.exact = {}
+        self.trie = {}
+        for redirect in redirects:
+            if redirect.prefix or '<' in redirect.path:
+                node = self.trie
+                for segment in self.get_segments(redirect.path):
+                    if segment.startswith('<'):
+                        if not int_segment_pattern.match(segment):
+                            raise ValueError(f'Unsupported segment {segment} in {redirect.path}')
+                        segment = INT_SEGMENT
+                    node = node.setdefault(segment, {})
+                node[PREFIX if redirect.prefix else END] = redirect
+            else:
+                self.exact[redirect.path] = redirect
+
+    @staticmethod
+    def get_segments(path):
+        return path.rstrip('/').split('/')
+
+    def get(self, path):
+        """@returns Redirect for `path`, or None"""
+
+        redirect = self.exact.get(path)
+        if redirect is not None:
+            return redirect
+        return self.search(self.trie, self.get_segments(path), has_slash=path.endswith('/'))
+
+    def search(self, node, segments, has_slash):
+        if not segments:
+            redirect = node.get(END)
+            if redirect is not None and redirect.path.endswith('/') == has_slash:
+                return redirect
+            return None
+        segment = segments[0]
+        children = [node.get(segment)]
+        if segment.isascii() and segment.isdigit():
+            children.append(node.get(INT_SEGMENT))
+        for child in children:
+            if child is not None:
+                redirect = self.search(child, segments[1:], has_slash)
+                if redirect is not None:
+                    return redirect
+        # a prefix matches only the paths longer than itself
+        redirect = node.get(PREFIX)
+        if redirect is not None and (has_slash or not redirect.path.endswith('/')):
+            return redirect
+        return None
+
+
+def get_response(redirect):
+    response_class = HttpResponsePermanentRedirect if redirect.permanent else HttpResponseRedirect
+    return response_class(str(redirect.url))
+
+
+def get_url_patterns(redirects):
+    """
+    @returns list - url patterns equivalent to `redirects`, so they can be
+    reversed and still work without LegacyRedirectMiddleware
+
+    """
+
+    patterns = []
+    for redirect in redirects:
+        view = RedirectView.as_view(url=str(redirect.url), permanent=redirect.permanent)
+        if redirect.prefix:
+            end = '/$' if redirect.path.endswith('/') else '$'
+            patterns.append(re_path(f'^{re.escape(redirect.path)}.+{end}', view, name=redirect.name))
+        else:
+            patterns.append(path(redirect.path, view, name=redirect.name))
+    return patterns
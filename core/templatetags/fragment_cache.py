@@ -0,0 +1,68 @@
+from django import template
+from django.utils import translation
+
+from core.cache import TieredCache
+from core.instrumentation import fragment_cache_lookups
+from core.templating import get_templates_digest
+
+
+register = template.Library()
+
+
+class FragmentCache(TieredCache):
+    """
+    Rendered template fragments, keyed by fragment name, language, template
+    sources and the values the fragment varies on.
+
+    """
+
+    key_prefix = 'template-fragment'
+    timeout_setting = 'FRAGMENT_CACHE_TIMEOUT'
+    maxsize_setting = 'FRAGMENT_CACHE_MAXSIZE'
+    l2_setting = 'FRAGMENT_CACHE_L2'
+    lookups = fragment_cache_lookups
+
+
+fragment_cache = FragmentCache()
+
+
+class CacheFragmentNode(template.Node):
+
+    def __init__(self, nodelist, name, vary_on):
+        self.nodelist = nodelist
+        self.name = name
+        self.vary_on = vary_on
+
+    def get_key(self, context):
+        values = [str(variable.resolve(context)) for variable in self.vary_on]
+        return '\x1f'.join([self.name, get_templates_digest(), translation.get_language() or '', *values])
+
+    def render(self, context):
+        key = self.get_key(context)
+        rendered = fragment_cache.get(key)
+        if rendered is None:
+            rendered = self.nodelist.render(context)
+            fragment_cache.set(key, rendered)
+        return rendered
+
+
+@register.tag
+def cache_fragment(parser, token):
+    """
+    Caches the enclosed fragment. Anything the fragment depends on other
+    than the language and the templates must be listed after the name:
+
+        {% cache_fragment 'header' sso_is_logged_in sso_login_url %}
+            ...
+        {% endcache_fragment %}
+
+    """
+
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' tag requires at least one argument.")
+    nodelist = parser.parse(('endcache_fragment',))
+    parser.delete_first_token()
+    name = bits[1].strip('\'"')
+    vary_on = [parser.compile_filter(bit) for bit in bits[2:]]
+    return CacheFragmentNode(nodelist, name, vary_on)
@@ -0,0 +1,62 @@
+import functools
+import hashlib
+import os
+import time
+
+from django.template import TemplateSyntaxError, engines
+
+
+def iter_template_paths(engine_name='django'):
+    """
+    @returns generator - (template name, file path) of every template the
+    engine's loaders can find, in the order the loaders search them
+
+    """
+
+    engine = engines[engine_name].engine
+    for loader in engine.template_loaders:
+        for directory in loader.get_dirs():
+            for root, dirs, files in os.walk(directory):
+                dirs.sort()
+                for file_name in sorted(files):
+                    path = os.path.join(root, file_name)
+                    yield os.path.relpath(path, directory), path
+
+
+@functools.lru_cache(maxsize=None)
+def get_templates_digest():
+    """
+    @returns str - digest of the source of every template, which changes
+    whenever a deploy changes any template
+
+    """
+
+    digest = hashlib.sha256()
+    for name, path in iter_template_paths():
+        digest.update(name.encode())
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def precompile_templates(engine_name='django'):
+    """
+    Parse every template into the engine's cached loader, so the first
+    requests of a process do not pay for it.
+
+    @returns list - (template name, seconds taken, error or None), in the
+    order the templates were found
+
+    """
+
+    engine = engines[engine_name].engine
+    timings = []
+    for name, path in iter_template_paths(engine_name):
+        start_time = time.perf_counter()
+        try:
+            engine.get_template(name)
+        except (TemplateSyntaxError, UnicodeDecodeError) as error:
+            timings.append((name, time.perf_counter() - start_time, error))
+        else:
+            timings.append((name, time.perf_counter() - start_time, None))
+    return timings
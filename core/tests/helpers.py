@@ -1,8 +1,79 @@
+from contextlib import contextmanager
+from unittest import mock
+
 import requests
 
+from core import instrumentation
+
 
 def create_response(status_code=200, json_body={}):
     response = requests.Response()
     response.status_code = status_code
     response.json = lambda: json_body
     return response
+
+
+class OutboundCalls:
+    """
+    Counts outbound calls by service and endpoint, for asserting how many
+    calls a request makes.
+
+    Real calls are counted as they are made. Calls to a method replaced with
+    a mock are read from the mock's call count, so patches applied before or
+    after counting starts are both counted, as long as they are still in
+    place when the count is read.
+
+    """
+
+    def __init__(self):
+        self.calls = instrumentation.Counters()
+        self.initial_mock_call_counts = {}
+
+    def record(self, service, endpoint):
+        self.calls.increment((service, endpoint))
+
+    def start(self):
+        for owner, name, service, endpoint in instrumentation.outbound_methods:
+            method = getattr(owner, name, None)
+            if isinstance(method, mock.NonCallableMock):
+                self.initial_mock_call_counts[id(method)] = method.call_count
+        instrumentation.outbound_call_listeners.append(self.record)
+
+    def stop(self):
+        instrumentation.outbound_call_listeners.remove(self.record)
+
+    def snapshot(self):
+        """
+        @returns dict - number of calls keyed by (service, endpoint)
+
+        """
+
+        counts = self.calls.snapshot()
+        for owner, name, service, endpoint in instrumentation.outbound_methods:
+            method = getattr(owner, name, None)
+            if isinstance(method, mock.NonCallableMock):
+                calls = method.call_count - self.initial_mock_call_counts.get(id(method), 0)
+                if calls:
+                    counts[(service, endpoint)] = counts.get((service, endpoint), 0) + calls
+        return counts
+
+    def count(self, service=None, endpoint=None):
+        return sum(
+            calls for (call_service, call_endpoint), calls in self.snapshot().items()
+            if service in (None, call_service) and endpoint in (None, call_endpoint)
+        )
+
+    def assert_budget(self, maximum, service=None, endpoint=None):
+        count = self.count(service=service, endpoint=endpoint)
+        target = ' '.join(filter(None, [service, endpoint])) or 'any endpoint'
+        assert count <= maximum, f'{count} outbound calls to {target}, over the budget of {maximum}: {self.snapshot()}'
+
+
+@contextmanager
+def count_outbound_calls():
+    outbound_calls = OutboundCalls()
+    outbound_calls.start()
+    try:
+        yield outbound_calls
+    finally:
+        outbound_calls.stop()
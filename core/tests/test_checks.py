@@ -0,0 +1,26 @@
+from django.utils.deprecation import MiddlewareMixin
+
+from core import checks
+
+
+class NoHooksMiddleware(MiddlewareMixin):
+    pass
+
+
+def test_check_middleware_ok():
+    assert checks.check_middleware(app_configs=None) == []
+
+
+def test_check_middleware_duplicate(settings):
+    settings.MIDDLEWARE = [
+        'django.contrib.sessions.middleware.SessionMiddleware',
+        'django.contrib.sessions.middleware.SessionMiddleware',
+    ]
+
+    assert [message.id for message in checks.check_middleware(app_configs=None)] == ['core.W001']
+
+
+def test_check_middleware_no_hooks(settings):
+    settings.MIDDLEWARE = ['core.tests.test_checks.NoHooksMiddleware']
+
+    assert [message.id for message in checks.check_middleware(app_configs=None)] == ['core.W002']
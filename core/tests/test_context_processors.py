@@ -0,0 +1,16 @@
+from unittest import mock
+
+from core.context_processors import lazy
+
+
+def test_lazy_context_processor(rf):
+    processor = mock.Mock(return_value={'one': 1, 'two': {'three': 3}})
+    request = rf.get('/')
+
+    context = lazy(processor, keys=['one', 'two'])(request)
+
+    assert processor.call_count == 0
+    assert context['two']['three'] == 3
+    assert context['one'] == 1
+    assert processor.call_args == mock.call(request)
+    assert processor.call_count == 1
@@ -0,0 +1,172 @@
+import random
+import threading
+
+from directory_sso_api_client.backends import SSOUserBackend
+import pytest
+import requests
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from core import fake_upstream
+
+
+@pytest.fixture
+def config():
+    return fake_upstream.FakeUpstreamConfig(csv_dump_size=200 * 1024, search_results=3)
+
+
+@pytest.fixture
+def base_urls(config):
+    server = fake_upstream.FakeUpstreamServer(('127.0.0.1', 0), config)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.get_base_urls()
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize('spec,expected', (
+    ('fixed:20', 0.02),
+    ('uniform:10:10', 0.01),
+    ('normal:30:0', 0.03),
+    ('lognormal:40:0', 0.04),
+    ('normal:-30:0', 0),
+))
+def test_parse_latency(spec, expected):
+    sample = fake_upstream.parse_latency(spec)
+
+    assert sample() == pytest.approx(expected)
+
+
+def test_parse_latency_lognormal_median():
+    sample = fake_upstream.parse_latency('lognormal:40:0.5', rng=random.Random(1))
+
+    samples = sorted(sample() for _ in range(2001))
+
+    assert samples[1000] == pytest.approx(0.04, rel=0.1)
+
+
+@pytest.mark.parametrize('spec', ('fixed', 'fixed:a', 'uniform:1', 'pareto:1', 'exponential:0'))
+def test_parse_latency_invalid(spec):
+    with pytest.raises(ValueError):
+        fake_upstream.parse_latency(spec)
+
+
+def test_parse_per_service():
+    parsed = fake_upstream.parse_per_service(['0.1', 'sso=0.5'], fake_upstream.parse_error_rate)
+
+    assert parsed == {'directory-api': 0.1, 'sso': 0.5, 'companies-house': 0.1}
+
+
+@pytest.mark.parametrize('specs', (['unknown=0.1'], ['sso=2']))
+def test_parse_per_service_invalid(specs):
+    with pytest.raises(ValueError):
+        fake_upstream.parse_per_service(specs, fake_upstream.parse_error_rate)
+
+
+def test_command_invalid_latency():
+    with pytest.raises(CommandError):
+        call_command('fake_upstream', latency=['sso=pareto:1'])
+
+
+def test_session_user(base_urls):
+    response = requests.get(
+        base_urls['DIRECTORY_SSO_API_CLIENT_BASE_URL'] + 'api/v1/session-user/',
+        params={'session_key': 'abc'},
+    )
+
+    assert response.status_code == 200
+    kwargs = SSOUserBackend().user_kwargs(session_id='abc', parsed=response.json())
+    assert kwargs['has_user_profile'] is True
+
+
+@pytest.mark.parametrize('session_id,company_status,is_owner,is_verified', (
+    ('abc', 200, True, True),
+    ('unverified-abc', 200, True, False),
+    ('no-company-abc', 404, False, None),
+))
+def test_profiles_depend_on_session_id(base_urls, session_id, company_status, is_owner, is_verified):
+    base_url = base_urls['DIRECTORY_API_CLIENT_BASE_URL']
+    headers = {'Authorization': f'SSO_SESSION_ID {session_id}'}
+
+    company_response = requests.get(base_url + 'supplier/company/', headers=headers)
+    supplier_response = requests.get(base_url + f'supplier/{session_id}/', headers=headers)
+
+    assert company_response.status_code == company_status
+    assert supplier_response.json()['is_company_owner'] is is_owner
+    if is_verified is not None:
+        assert company_response.json()['is_verified'] is is_verified
+
+
+def test_profile_padding(base_urls, config):
+    config.profile_padding = 10000
+
+    response = requests.get(
+        base_urls['DIRECTORY_API_CLIENT_BASE_URL'] + 'supplier/company/',
+        headers={'Authorization': 'SSO_SESSION_ID abc'},
+    )
+
+    assert len(response.content) > 10000
+
+
+@pytest.mark.parametrize('name', ('buyer', 'supplier'))
+def test_csv_dump_size(base_urls, name):
+    response = requests.get(
+        base_urls['DIRECTORY_API_CLIENT_BASE_URL'] + f'{name}/csv-dump/', params={'token': 'debug'}, stream=True
+    )
+
+    content = b''.join(response.iter_content(chunk_size=None))
+    assert response.status_code == 200
+    assert response.headers['Content-Type'] == 'text/csv'
+    assert content.startswith(fake_upstream.CSV_DUMP_HEADER)
+    assert 200 * 1024 <= len(content) < 200 * 1024 + 100
+
+
+def test_companies_house(base_urls):
+    base_url = base_urls['COMPANIES_HOUSE_API_URL']
+
+    profile_response = requests.get(base_url + 'company/01234567')
+    search_response = requests.get(base_url + 'search/companies', params={'q': 'great'})
+    token_response = requests.post(base_urls['COMPANIES_HOUSE_URL'] + 'oauth2/token', params={'code': '123'})
+
+    assert profile_response.json()['company_number'] == '01234567'
+    assert search_response.json()['total_results'] == 3
+    assert token_response.json()['access_token'] == 'fake-access-token'
+
+
+def test_oauth2_authorise_redirects_back(base_urls):
+    response = requests.get(
+        base_urls['COMPANIES_HOUSE_URL'] + 'oauth2/authorise',
+        params={'redirect_uri': 'http://buyer.trade.great:8001/callback/'},
+        allow_redirects=False,
+    )
+
+    assert response.status_code == 302
+    assert response.headers['Location'] == 'http://buyer.trade.great:8001/callback/?code=fake-oauth2-code'
+
+
+def test_injected_errors(base_urls, config):
+    config.error_rate = {'sso': 1}
+
+    sso_response = requests.get(
+        base_urls['DIRECTORY_SSO_API_CLIENT_BASE_URL'] + 'api/v1/session-user/', params={'session_key': 'abc'}
+    )
+    api_response = requests.get(base_urls['DIRECTORY_API_CLIENT_BASE_URL'] + 'supplier/abc/')
+
+    assert sso_response.status_code == 503
+    assert api_response.status_code == 200
+
+
+def test_injected_latency(base_urls, config):
+    config.latency = {'companies-house': fake_upstream.parse_latency('fixed:100')}
+
+    response = requests.get(base_urls['COMPANIES_HOUSE_API_URL'] + 'company/01234567')
+
+    assert response.elapsed.total_seconds() >= 0.1
+
+
+def test_unknown_path(base_urls):
+    response = requests.get(base_urls['DIRECTORY_API_CLIENT_BASE_URL'] + 'unknown/')
+
+    assert response.status_code == 404
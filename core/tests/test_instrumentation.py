@@ -0,0 +1,190 @@
+from unittest import mock
+
+from directory_api_client.client import api_client
+import pytest
+import requests
+
+from django.test.client import Client, ClientHandler
+from django.urls import reverse
+
+from core import instrumentation
+from core.tests.helpers import count_outbound_calls, create_response
+from enrolment.helpers import CompaniesHouseClient
+
+
+class TimedClientHandler(instrumentation.MiddlewareTimingMixin, ClientHandler):
+    pass
+
+
+def test_histogram():
+    histogram = instrumentation.Histogram()
+    for value in [0.0002, 0.0002, 0.003, 2]:
+        histogram.observe(value)
+
+    assert histogram.count == 4
+    assert histogram.sum == 2.0034
+    assert histogram.quantile(0.5) == 0.00025
+    assert histogram.quantile(0.75) == 0.005
+    assert histogram.quantile(1) == float('inf')
+    assert histogram.as_dict()['buckets'][0.005] == 3
+
+
+def test_timed_middleware_records_phases(settings, auth_backend):
+    instrumentation.middleware_timings.reset()
+    auth_backend.return_value = create_response(200, {'id': 1, 'email': 'jim@example.com', 'hashed_uuid': '987'})
+    client = Client()
+    client.handler = TimedClientHandler()
+    client.cookies[settings.SSO_SESSION_COOKIE] = '123'
+
+    response = client.get(reverse('unsubscribe'))
+
+    assert response.status_code == 200
+    timings = instrumentation.middleware_timings.snapshot()
+    for path in settings.MIDDLEWARE:
+        assert timings[(path, 'request')]['count'] == 1
+        assert timings[(path, 'response')]['count'] == 1
+    assert timings[('core.middleware.GA360Middleware', 'template_response')]['count'] == 1
+
+
+def test_timed_middleware_short_circuit(settings):
+    instrumentation.middleware_timings.reset()
+    settings.FEATURE_FLAGS['MAINTENANCE_MODE_ON'] = True
+    client = Client()
+    client.handler = TimedClientHandler()
+
+    response = client.get(reverse('robots'))
+
+    assert response.status_code == 302
+    timings = instrumentation.middleware_timings.snapshot()
+    path = 'directory_components.middleware.MaintenanceModeMiddleware'
+    assert timings[(path, 'request')]['count'] == 1
+    assert (path, 'response') not in timings
+    assert ('django.middleware.common.CommonMiddleware', 'request') not in timings
+
+
+def test_timed_middleware_logs_summary(settings, caplog):
+    settings.MIDDLEWARE_TIMING_LOG_INTERVAL = 2
+    client = Client()
+    client.handler = TimedClientHandler()
+
+    client.get(reverse('robots'))
+    assert 'Middleware timings' not in caplog.text
+    client.get(reverse('robots'))
+    assert 'Middleware timings' in caplog.text
+
+
+@pytest.fixture
+def outbound_metrics():
+    instrumentation.outbound_calls.reset()
+    instrumentation.outbound_timings.reset()
+    instrumentation.outbound_bytes.reset()
+
+
+def test_record_outbound_call(outbound_metrics):
+    response = requests.Response()
+    response.status_code = 404
+    response._content = b'not found'
+
+    record = instrumentation.record_outbound_call('directory-api', 'company.profile_retrieve')
+    record(lambda: response)()
+
+    key = ('directory-api', 'company.profile_retrieve')
+    assert instrumentation.outbound_calls.snapshot() == {(*key, '4xx'): 1}
+    assert instrumentation.outbound_bytes.snapshot() == {key: 9}
+    assert instrumentation.outbound_timings.snapshot()[key]['count'] == 1
+
+
+def test_record_outbound_call_error(outbound_metrics):
+    def send():
+        raise requests.exceptions.ConnectionError()
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        instrumentation.record_outbound_call('sso', 'user.get_session_user')(send)()
+
+    assert instrumentation.outbound_calls.snapshot() == {('sso', 'user.get_session_user', 'error'): 1}
+
+
+def test_api_clients_instrumented(outbound_metrics, requests_mock):
+    requests_mock.get('http://api.trade.great:8000/supplier/company/', json={'name': 'Great company'})
+
+    api_client.company.profile_retrieve('123')
+
+    assert instrumentation.outbound_calls.snapshot() == {
+        ('directory-api', 'company.profile_retrieve', '2xx'): 1
+    }
+
+
+def test_companies_house_client_instrumented(outbound_metrics, requests_mock):
+    requests_mock.get('https://api.companieshouse.gov.uk/company/123', status_code=503)
+
+    CompaniesHouseClient.get('https://api.companieshouse.gov.uk/company/123')
+
+    assert instrumentation.outbound_calls.snapshot() == {('companies-house', 'profile', '5xx'): 1}
+
+
+def test_outbound_calls_counts_real_calls(outbound_calls, requests_mock):
+    requests_mock.get('http://api.trade.great:8000/supplier/company/', json={})
+    requests_mock.get('https://api.companieshouse.gov.uk/company/123', json={})
+
+    api_client.company.profile_retrieve('123')
+    api_client.company.profile_retrieve('123')
+    CompaniesHouseClient.get('https://api.companieshouse.gov.uk/company/123')
+
+    assert outbound_calls.snapshot() == {
+        ('directory-api', 'company.profile_retrieve'): 2,
+        ('companies-house', 'profile'): 1,
+    }
+    assert outbound_calls.count(service='directory-api') == 2
+    assert outbound_calls.count() == 3
+
+
+def test_outbound_calls_counts_mocked_calls(outbound_calls):
+    with mock.patch.object(api_client.supplier, 'retrieve_profile') as mock_retrieve_profile:
+        api_client.supplier.retrieve_profile('123')
+
+        assert outbound_calls.snapshot() == {('directory-api', 'supplier.retrieve_profile'): 1}
+    assert mock_retrieve_profile.call_count == 1
+
+
+def test_outbound_calls_ignores_calls_before_counting():
+    with mock.patch.object(api_client.supplier, 'retrieve_profile'):
+        api_client.supplier.retrieve_profile('123')
+
+        with count_outbound_calls() as outbound_calls:
+            api_client.supplier.retrieve_profile('123')
+
+            assert outbound_calls.count(endpoint='supplier.retrieve_profile') == 1
+
+
+def test_outbound_calls_assert_budget(outbound_calls):
+    with mock.patch.object(api_client.supplier, 'retrieve_profile'):
+        api_client.supplier.retrieve_profile('123')
+        api_client.supplier.retrieve_profile('123')
+
+        outbound_calls.assert_budget(2, service='directory-api')
+        with pytest.raises(AssertionError, match='over the budget of 1'):
+            outbound_calls.assert_budget(1, service='directory-api')
+
+
+def test_render_prometheus(outbound_metrics):
+    record = instrumentation.record_outbound_call('directory-api', 'buyer.get_csv_dump')
+    record(lambda: create_response(200))()
+
+    content = instrumentation.render_prometheus()
+
+    assert '# TYPE outbound_request_duration_seconds histogram' in content
+    assert (
+        'outbound_request_duration_seconds_bucket{service="directory-api",endpoint="buyer.get_csv_dump",le="+Inf"} 1'
+    ) in content
+    assert 'outbound_request_duration_seconds_count{service="directory-api",endpoint="buyer.get_csv_dump"} 1' in content
+    assert '# TYPE companies_house_pool_requests gauge' in content
+
+
+def test_record_outbound_call_streamed_response_not_read(outbound_metrics, requests_mock):
+    requests_mock.get('http://api.trade.great:8000/buyer/csv-dump/', content=b'abc', headers={'Content-Length': '3'})
+    record = instrumentation.record_outbound_call('directory-api', 'buyer.get_csv_dump')
+
+    response = record(requests.get)('http://api.trade.great:8000/buyer/csv-dump/', stream=True)
+
+    assert response._content_consumed is False
+    assert instrumentation.outbound_bytes.snapshot() == {('directory-api', 'buyer.get_csv_dump'): 3}
@@ -1,7 +1,17 @@
+from unittest import mock
+
+from directory_constants import urls
+import pytest
+
 from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponse
 from django.template.response import TemplateResponse
+from django.urls import include, path, re_path, reverse
+from django.utils import translation
 
 from core import middleware
+from core.policies import anonymous_only
 
 
 def test_ga360_middleware_keys(rf, user):
@@ -50,3 +60,161 @@ def test_ga360_middleware_not_logged_in(rf):
 
     assert not response.context_data['ga360']['user_id']
     assert not response.context_data['ga360']['login_status']
+
+
+def test_ga360_middleware_skip_ga360(rf, user):
+    request = rf.get('/')
+    request.user = user
+    request.skip_ga360 = True
+    response = TemplateResponse(request, 'core/base.html')
+    response.context_data = {}
+    instance = middleware.GA360Middleware(get_response=response)
+
+    instance.process_template_response(request, response)
+
+    assert 'ga360' not in response.context_data
+
+
+def test_ga360_middleware_static_payload_per_language(rf, user):
+    request = rf.get('/')
+    request.user = user
+    instance = middleware.GA360Middleware(get_response=lambda request: None)
+
+    for language in ['en-gb', 'fr', 'en-gb']:
+        response = TemplateResponse(request, 'core/base.html')
+        with translation.override(language):
+            instance.process_template_response(request, response)
+        assert response.context_data['ga360']['site_language'] == language
+        assert response.context_data['ga360']['business_unit'] == 'GreatDomestic'
+
+    assert sorted(instance.static_payloads) == ['en-gb', 'fr']
+    # the shared payload is not modified by per-user fields
+    assert 'user_id' not in instance.static_payloads['en-gb']
+
+
+@pytest.mark.parametrize('url', [
+    '/find-a-buyer/robots.txt',
+    '/find-a-buyer/sitemap.xml',
+    '/pingdom/ping.xml',
+])
+def test_anonymous_route_middleware_skips_sso(client, user, auth_backend, url):
+    client.force_login(user)
+
+    response = client.get(url)
+
+    assert response.status_code == 200
+    assert auth_backend.call_count == 0
+    assert 'Cookie' not in response.get('Vary', '')
+
+
+def test_anonymous_route_middleware_renders_template_response(client):
+    response = client.get('/find-a-buyer/robots.txt')
+
+    assert response.status_code == 200
+    assert response.content
+    assert 'ga360' not in response.context_data
+
+
+def test_anonymous_route_middleware_other_routes(client, user, auth_backend):
+    client.force_login(user)
+
+    with mock.patch.object(middleware, 'resolve', wraps=middleware.resolve) as mock_resolve:
+        client.get('/find-a-buyer/confirm-company-address/')
+
+    assert auth_backend.call_count == 1
+    assert mock_resolve.call_count == 0
+
+
+def anonymous_view(request):
+    return HttpResponse()
+
+
+def test_iter_anonymous_paths():
+    url_patterns = [
+        re_path(r'^prefix/', include([
+            re_path(r'^robots\.txt$', anonymous_only(anonymous_view)),
+            re_path(r'^other/$', anonymous_view),
+        ])),
+        path('ping.xml', anonymous_only(anonymous_view)),
+    ]
+
+    assert list(middleware.iter_anonymous_paths(url_patterns)) == ['/prefix/robots.txt', '/ping.xml']
+
+
+def test_iter_anonymous_paths_requires_fixed_path():
+    url_patterns = [re_path(r'^dump/(?P<name>\w+)/$', anonymous_only(anonymous_view))]
+
+    with pytest.raises(ImproperlyConfigured):
+        list(middleware.iter_anonymous_paths(url_patterns))
+
+
+@pytest.mark.parametrize('url', [
+    '/find-a-buyer/company-profile/edit/logo/',
+    '/find-a-buyer/register/company/',
+    '/find-a-buyer/company/case-study/edit/12/',
+    '/company-profile/',
+])
+def test_legacy_redirect_middleware(client, user, auth_backend, settings, url):
+    client.force_login(user)
+
+    response = client.get(url)
+
+    assert response.status_code == 302
+    assert response.url.startswith(urls.domestic.SINGLE_SIGN_ON_PROFILE)
+    assert response['Cache-Control'] == f'public, max-age={settings.LEGACY_REDIRECT_CACHE_MAX_AGE}'
+    assert auth_backend.call_count == 0
+
+
+def test_legacy_redirect_middleware_unmatched(client):
+    response = client.get('/find-a-buyer/company/case-study/edit/abc/x/')
+
+    assert response.status_code == 404
+
+
+def test_legacy_redirect_middleware_requires_trailing_slash(client):
+    response = client.get('/find-a-buyer/register/company')
+
+    # as before, CommonMiddleware appends the slash first
+    assert response.status_code == 301
+    assert response.url == '/find-a-buyer/register/company/'
+
+
+def test_legacy_redirect_middleware_disabled(client, settings):
+    settings.MIDDLEWARE = [
+        path for path in settings.MIDDLEWARE if path != 'core.middleware.LegacyRedirectMiddleware'
+    ]
+
+    response = client.get(reverse('company-detail'))
+
+    assert response.status_code == 302
+    assert response.url == urls.domestic.SINGLE_SIGN_ON_PROFILE
+    assert 'Cache-Control' not in response
+
+
+@pytest.mark.parametrize('url,expected', [
+    ('/find-a-buyer/robots.txt', 'public, max-age=3600'),
+    ('/find-a-buyer/sitemap.xml', 'public, max-age=3600'),
+    # the view's own never_cache header is kept
+    ('/pingdom/ping.xml', 'max-age=0, no-cache, no-store, must-revalidate, private'),
+    ('/find-a-buyer/data-science/buyers/', 'private, no-cache'),
+])
+def test_cache_policy_routes(client, user, url, expected):
+    client.force_login(user)
+
+    response = client.get(url)
+
+    assert response['Cache-Control'] == expected
+
+
+def test_cache_policy_middleware_authenticated(client, user):
+    client.force_login(user)
+
+    response = client.get('/find-a-buyer/confirm-company-address/')
+
+    assert response['Cache-Control'] == 'private, no-store, no-cache, must-revalidate'
+
+
+def test_cache_policy_middleware_anonymous(client):
+    response = client.get('/find-a-buyer/confirm-company-address/')
+
+    assert 'Cache-Control' not in response
@@ -0,0 +1,42 @@
+from unittest import mock
+
+from redis.exceptions import ConnectionError
+
+from core.pingdom import services
+
+
+@mock.patch.object(services, 'redis_client')
+def test_redis_health_check_reuses_client(mock_redis_client):
+    services.RedisHealthCheck().check()
+    services.RedisHealthCheck().check()
+
+    assert mock_redis_client.ping.call_count == 2
+
+
+@mock.patch.object(services, 'redis_client')
+def test_redis_health_check_round_trip_time(mock_redis_client):
+    check = services.RedisHealthCheck()
+
+    assert check.check() == (True, '')
+    assert check.round_trip_time >= 0
+
+
+@mock.patch.object(services, 'redis_client')
+def test_redis_health_check_connection_error(mock_redis_client):
+    error = ConnectionError('Connection refused')
+    mock_redis_client.ping.side_effect = error
+    check = services.RedisHealthCheck()
+
+    assert check.check() == (False, error)
+    assert check.round_trip_time is None
+
+
+def test_run_checks_reports_round_trip_time():
+    def check(self):
+        self.round_trip_time = 0.5
+        return True, ''
+
+    with mock.patch.object(services.RedisHealthCheck, 'check', check):
+        checked = services.run_checks([services.RedisHealthCheck], timeout=1)
+
+    assert checked == {'redis': (True, '', 0.5)}
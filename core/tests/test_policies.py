@@ -0,0 +1,123 @@
+from unittest import mock
+
+import pytest
+
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+
+from core.policies import AccessPolicy, CachePolicy, Gate, no_store
+
+
+def view(request):
+    return HttpResponse('OK')
+
+
+def test_access_policy_anon_user_redirected_to_login(rf, settings):
+    policy = AccessPolicy(Gate(name='gate', test=lambda user: True, redirect_url='/fail/'))
+    request = rf.get('/')
+    request.user = AnonymousUser()
+
+    response = policy(view)(request)
+
+    assert response.status_code == 302
+    assert response.url.startswith(settings.LOGIN_URL)
+
+
+def test_access_policy_first_failing_gate_redirects(rf, user):
+    test_two = mock.Mock(return_value=False)
+    test_three = mock.Mock(return_value=False)
+    policy = AccessPolicy(
+        Gate(name='one', test=lambda user: True, redirect_url='/one/'),
+        Gate(name='two', test=test_two, redirect_url='/two/'),
+        Gate(name='three', test=test_three, redirect_url='/three/'),
+    )
+    request = rf.get('/')
+    request.user = user
+
+    response = policy(view)(request)
+
+    assert response.status_code == 302
+    assert response.url == '/two/'
+    assert test_two.call_args == mock.call(user)
+    assert test_three.call_count == 0
+    assert list(request.access_policy_timings) == ['one', 'two']
+
+
+def test_access_policy_all_gates_pass(rf, user):
+    policy = AccessPolicy(Gate(name='one', test=lambda user: True, redirect_url='/one/'))
+    request = rf.get('/')
+    request.user = user
+
+    response = policy(view)(request)
+
+    assert response.content == b'OK'
+    assert request.access_policy_timings['one'] >= 0
+
+
+def test_access_policy_prefetches_profiles(rf, user):
+    policy = AccessPolicy(
+        Gate(name='one', test=lambda user: True, redirect_url='/', profiles=['company']),
+        Gate(name='two', test=lambda user: True, redirect_url='/', profiles=['company', 'supplier']),
+    )
+    request = rf.get('/')
+    request.user = user
+
+    with mock.patch.object(user, 'load_profiles') as mock_load_profiles:
+        policy(view)(request)
+
+    assert policy.profiles == ('company', 'supplier')
+    assert mock_load_profiles.call_args == mock.call(names=('company', 'supplier'))
+
+
+def test_access_policy_single_profile_not_prefetched(rf, user):
+    policy = AccessPolicy(Gate(name='one', test=lambda user: True, redirect_url='/', profiles=['company']))
+    request = rf.get('/')
+    request.user = user
+
+    with mock.patch.object(user, 'load_profiles') as mock_load_profiles:
+        policy(view)(request)
+
+    assert mock_load_profiles.call_count == 0
+
+
+@pytest.mark.parametrize('status_code,cookie,expected', [
+    (200, False, 'public, max-age=60'),
+    (404, False, 'public, max-age=60'),
+    (500, False, 'private, no-cache'),
+    (200, True, 'private, no-cache'),
+])
+def test_cache_policy_public(rf, status_code, cookie, expected):
+    def view(request):
+        response = HttpResponse(status=status_code)
+        if cookie:
+            response.set_cookie('name', 'value')
+        return response
+
+    response = CachePolicy(public=True, max_age=60, vary=['Accept-Language'])(view)(rf.get('/'))
+
+    assert response['Cache-Control'] == expected
+    assert response['Vary'] == 'Accept-Language'
+
+
+def test_cache_policy_no_store(rf):
+    response = no_store(view)(rf.get('/'))
+
+    assert response['Cache-Control'] == 'private, no-store, no-cache, must-revalidate'
+
+
+def test_cache_policy_methods(rf):
+    policy = CachePolicy(methods=['GET'])
+
+    assert policy(view)(rf.get('/'))['Cache-Control'] == 'private, no-cache'
+    assert policy(view)(rf.post('/'))['Cache-Control'] == 'private, no-store, no-cache, must-revalidate'
+
+
+def test_cache_policy_view_header_kept(rf):
+    def view(request):
+        response = HttpResponse()
+        response['Cache-Control'] = 'max-age=1'
+        return response
+
+    response = CachePolicy(public=True, max_age=60)(view)(rf.get('/'))
+
+    assert response['Cache-Control'] == 'max-age=1'
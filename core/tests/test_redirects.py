@@ -0,0 +1,66 @@
+import pytest
+
+from core.redirects import Redirect, RedirectTable, get_response, get_url_patterns
+
+
+@pytest.fixture
+def table():
+    return RedirectTable([
+        Redirect('register', 'https://example.com/enrol/'),
+        Redirect('register/', 'https://example.com/enrol/', prefix=True),
+        Redirect('company/edit/', 'https://example.com/edit/'),
+        Redirect('company/edit/', 'https://example.com/profile/', prefix=True),
+        Redirect('company/edit/logo/', 'https://example.com/logo/', prefix=True),
+        Redirect('case-study/edit/<int:id>/', 'https://example.com/case-study/'),
+    ])
+
+
+@pytest.mark.parametrize('path,expected', [
+    ('register', 'https://example.com/enrol/'),
+    ('register/company/', 'https://example.com/enrol/'),
+    ('register/company/step/', 'https://example.com/enrol/'),
+    ('register/company', None),
+    ('register/', None),
+    ('register-submit/', None),
+    ('company/edit/', 'https://example.com/edit/'),
+    ('company/edit/1/', 'https://example.com/profile/'),
+    ('company/edit/logo/2/', 'https://example.com/logo/'),
+    ('company/', None),
+    ('case-study/edit/12/', 'https://example.com/case-study/'),
+    ('case-study/edit/12', None),
+    ('case-study/edit/abc/', None),
+    ('case-study/edit/12/x/', None),
+    ('case-study/edit/', None),
+    ('', None),
+])
+def test_redirect_table_get(table, path, expected):
+    redirect = table.get(path)
+
+    assert (redirect.url if redirect else None) == expected
+
+
+def test_redirect_response_permanent():
+    response = get_response(Redirect('a/', 'https://example.com/', permanent=True))
+
+    assert response.status_code == 301
+    assert response.url == 'https://example.com/'
+
+
+def test_redirect_table_unsupported_segment():
+    with pytest.raises(ValueError):
+        RedirectTable([Redirect('case-study/<slug:name>/', 'https://example.com/')])
+
+
+@pytest.mark.parametrize('path,matches', [
+    ('register/company/', True),
+    ('register/company', False),
+    ('case-study/edit/12/', True),
+    ('case-study/edit/abc/', False),
+])
+def test_redirect_url_patterns(path, matches):
+    patterns = get_url_patterns([
+        Redirect('register/', 'https://example.com/enrol/', prefix=True),
+        Redirect('case-study/edit/<int:id>/', 'https://example.com/case-study/'),
+    ])
+
+    assert any(pattern.resolve(path) for pattern in patterns) is matches
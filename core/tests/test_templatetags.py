@@ -0,0 +1,60 @@
+import pytest
+
+from django.contrib.auth.models import AnonymousUser
+from django.template import Context, Template, TemplateSyntaxError
+from django.template.loader import render_to_string
+from django.utils import translation
+
+from core import instrumentation
+
+
+@pytest.fixture(autouse=True)
+def fragment_cache_lookups():
+    instrumentation.fragment_cache_lookups.reset()
+    yield instrumentation.fragment_cache_lookups
+    instrumentation.fragment_cache_lookups.reset()
+
+
+fragment = Template('{% load fragment_cache %}{% cache_fragment "greeting" name %}Hi {{ name }}{% endcache_fragment %}')
+
+
+def test_cache_fragment_varies_on_values(fragment_cache_lookups):
+    assert fragment.render(Context({'name': 'Jim'})) == 'Hi Jim'
+    assert fragment.render(Context({'name': 'Bob'})) == 'Hi Bob'
+    assert fragment.render(Context({'name': 'Jim'})) == 'Hi Jim'
+
+    assert fragment_cache_lookups.snapshot() == {('miss',): 2, ('l1_hit',): 1}
+
+
+def test_cache_fragment_varies_on_language(fragment_cache_lookups):
+    for language in ['en-gb', 'fr']:
+        with translation.override(language):
+            fragment.render(Context({'name': 'Jim'}))
+
+    assert fragment_cache_lookups.snapshot() == {('miss',): 2}
+
+
+def test_cache_fragment_l2(settings, fragment_cache, fragment_cache_lookups):
+    settings.FRAGMENT_CACHE_L2 = 'default'
+
+    fragment.render(Context({'name': 'Jim'}))
+    # e.g., another process
+    fragment_cache.clear()
+
+    assert fragment.render(Context({'name': 'Jim'})) == 'Hi Jim'
+    assert fragment_cache_lookups.snapshot() == {('miss',): 1, ('l2_hit',): 1}
+
+
+def test_cache_fragment_requires_name():
+    with pytest.raises(TemplateSyntaxError):
+        Template('{% load fragment_cache %}{% cache_fragment %}{% endcache_fragment %}')
+
+
+@pytest.mark.parametrize('url,cached', [('/find-a-buyer/', True), ('/find-a-buyer/?foo=1', False)])
+def test_header_fragment_anonymous(rf, fragment_cache, url, cached):
+    request = rf.get(url)
+    request.user = AnonymousUser()
+
+    render_to_string('base.html', request=request)
+
+    assert len(fragment_cache.entries) == (3 if cached else 2)
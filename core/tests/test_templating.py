@@ -0,0 +1,49 @@
+import io
+
+from django.core.management import call_command
+from django.template import engines
+
+from conf import gunicorn
+from core import templating
+
+
+def test_iter_template_paths():
+    names = [name for name, path in templating.iter_template_paths()]
+
+    assert 'base.html' in names
+    assert 'company-verify-hub.html' in names
+
+
+def test_templates_digest_cached():
+    assert templating.get_templates_digest() is templating.get_templates_digest()
+
+
+def test_precompile_templates():
+    timings = templating.precompile_templates()
+
+    names = [name for name, seconds, error in timings]
+    assert 'company-verify-hub.html' in names
+    assert all(error is None for name, seconds, error in timings)
+
+    loader = engines['django'].engine.template_loaders[0]
+    assert loader.get_template_cache['company-verify-hub.html']
+
+
+def test_precompile_templates_command():
+    out = io.StringIO()
+
+    call_command('precompile_templates', '--slowest', '3', stdout=out)
+
+    lines = out.getvalue().splitlines()
+    assert len(lines) == 4
+    assert lines[-1].endswith(' ms')
+
+
+def test_gunicorn_post_worker_init(settings):
+    settings.PRECOMPILE_TEMPLATES_ON_BOOT = True
+    loader = engines['django'].engine.template_loaders[0]
+    loader.reset()
+
+    gunicorn.post_worker_init(worker=None)
+
+    assert 'base.html' in loader.get_template_cache
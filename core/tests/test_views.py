@@ -1,9 +1,14 @@
+import re
+import time
+
 import pytest
 from unittest import mock
 
 from django.urls import reverse
 
+from core import instrumentation
 from core.pingdom.services import RedisHealthCheck
+from core.tests.helpers import create_response
 
 
 def test_pingdom_redis_healthcheck_ok(client):
@@ -27,3 +32,84 @@ def test_pingdom_redis_healthcheck_exception(mock_redis_check, client):
     with pytest.raises(ConnectionRefusedError):
         response = client.get(reverse('pingdom'))
         assert response.status_code == 500
+
+
+class SlowCheck:
+    name = 'slow'
+    delay = 0.2
+
+    def check(self):
+        time.sleep(self.delay)
+        return True, ''
+
+
+class OtherSlowCheck(SlowCheck):
+    name = 'other-slow'
+
+
+@mock.patch('core.views.health_check_services', (SlowCheck, OtherSlowCheck))
+def test_pingdom_checks_run_concurrently(client):
+    start_time = time.monotonic()
+    response = client.get(reverse('pingdom'))
+
+    assert response.status_code == 200
+    assert time.monotonic() - start_time < SlowCheck.delay * 2
+
+
+@mock.patch('core.views.health_check_services', (SlowCheck,))
+def test_pingdom_check_timeout(client, settings):
+    settings.PINGDOM_CHECK_TIMEOUT = 0.01
+
+    response = client.get(reverse('pingdom'))
+
+    assert response.status_code == 500
+    assert b'slow check did not finish within 0.01 seconds' in response.content
+
+
+@mock.patch.object(RedisHealthCheck, 'check', return_value=(True, ''))
+def test_pingdom_result_cached(mock_redis_check, client, settings):
+    client.get(reverse('pingdom'))
+    client.get(reverse('pingdom'))
+    assert mock_redis_check.call_count == 1
+
+    settings.PINGDOM_CACHE_SECONDS = 0
+    client.get(reverse('pingdom'))
+    assert mock_redis_check.call_count == 2
+
+
+@mock.patch.object(RedisHealthCheck, 'check', return_value=(True, ''))
+def test_pingdom_check_latency(mock_redis_check, client):
+    response = client.get(reverse('pingdom'))
+
+    assert b'<response_time>' in response.content
+    assert re.search(rb'<check name="redis" status="OK" response_time="[0-9.]+"/>', response.content)
+
+
+def test_metrics_no_token(client):
+    response = client.get(reverse('metrics'))
+
+    assert response.status_code == 403
+
+
+def test_metrics_wrong_token(client):
+    response = client.get(reverse('metrics'), {'token': 'wrong'})
+
+    assert response.status_code == 403
+
+
+def test_metrics(client, settings):
+    instrumentation.outbound_calls.reset()
+    record = instrumentation.record_outbound_call('directory-api', 'company.profile_retrieve')
+    record(lambda: create_response(200, {'name': 'Great company'}))()
+
+    response = client.get(reverse('metrics'), {'token': settings.METRICS_TOKEN})
+
+    assert response.status_code == 200
+    assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+    content = response.content.decode()
+    assert (
+        'outbound_requests_total{service="directory-api",endpoint="company.profile_retrieve",status_class="2xx"} 1'
+    ) in content
+    assert (
+        'outbound_request_duration_seconds_bucket{service="directory-api",endpoint="company.profile_retrieve"'
+    ) in content
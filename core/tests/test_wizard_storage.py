@@ -0,0 +1,85 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from core.wizard_storage import CacheStorage
+
+
+def build_storage(rf, cookies=None):
+    request = rf.get('/')
+    request.COOKIES.update(cookies or {})
+    return CacheStorage(prefix='test_view', request=request)
+
+
+def save(storage):
+    response = HttpResponse()
+    storage.update_response(response)
+    return response
+
+
+def test_cache_storage_round_trip(rf):
+    storage = build_storage(rf)
+    storage.current_step = 'address'
+    storage.set_step_data('address', {'address-postal_full_name': ['Jeremy']})
+
+    response = save(storage)
+
+    key = response.cookies['wizard_test_view'].value
+    assert 'Jeremy' not in key
+    assert response.cookies['wizard_test_view']['httponly'] is True
+
+    storage = build_storage(rf, cookies={'wizard_test_view': key})
+    assert storage.current_step == 'address'
+    assert storage.get_step_data('address')['address-postal_full_name'] == 'Jeremy'
+
+
+def test_cache_storage_compact(rf):
+    storage = build_storage(rf)
+    storage.current_step = 'address'
+
+    response = save(storage)
+
+    storage = build_storage(rf, cookies={'wizard_test_view': response.cookies['wizard_test_view'].value})
+    assert cache.get(storage.cache_key) == '{"s":"address","d":{},"f":{},"e":{}}'
+
+
+def test_cache_storage_empty_not_saved(rf):
+    storage = build_storage(rf)
+
+    response = save(storage)
+
+    assert 'wizard_test_view' not in response.cookies
+
+
+def test_cache_storage_unchanged_not_saved_again(rf):
+    storage = build_storage(rf)
+    storage.current_step = 'address'
+    key = save(storage).cookies['wizard_test_view'].value
+
+    storage = build_storage(rf, cookies={'wizard_test_view': key})
+    with mock.patch.object(storage.cache, 'set') as mock_set:
+        response = save(storage)
+
+    assert mock_set.call_count == 0
+    assert 'wizard_test_view' not in response.cookies
+
+
+def test_cache_storage_reset_deletes_data(rf):
+    storage = build_storage(rf)
+    storage.current_step = 'address'
+    key = save(storage).cookies['wizard_test_view'].value
+
+    storage = build_storage(rf, cookies={'wizard_test_view': key})
+    storage.reset()
+    response = save(storage)
+
+    assert response.cookies['wizard_test_view'].value == ''
+    assert cache.get(storage.cache_key) is None
+
+
+def test_cache_storage_unknown_key(rf):
+    storage = build_storage(rf, cookies={'wizard_test_view': 'expired'})
+
+    assert storage.current_step is None
+    assert storage.get_step_data('address') is None
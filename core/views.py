@@ -1,30 +1,60 @@
-from django.http import HttpResponse
+import threading
+import time
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
 from django.template.loader import render_to_string
+from django.utils.crypto import constant_time_compare
 from django.utils.decorators import method_decorator
 from django.views.decorators.cache import never_cache
-from django.views.generic import TemplateView
+from django.views.generic import TemplateView, View
 
-from core.pingdom.services import health_check_services
+from core.instrumentation import render_prometheus
+from core.pingdom.services import health_check_services, run_checks
 
 HEALTH_CHECK_STATUS = 0
 HEALTH_CHECK_EXCEPTION = 1
+HEALTH_CHECK_LATENCY = 2
 
 
 class PingDomView(TemplateView):
-    template_name = 'directory_healthcheck/pingdom.xml'
+    template_name = 'pingdom.xml'
 
     status = 'OK'
 
+    # probes arriving within PINGDOM_CACHE_SECONDS of each other share one
+    # run of the checks, so frequent probing does not become backend load
+    cache_lock = threading.Lock()
+    cache = None
+
+    @classmethod
+    def get_checked(cls):
+        with cls.cache_lock:
+            if cls.cache is None or time.monotonic() - cls.cache[0] >= settings.PINGDOM_CACHE_SECONDS:
+                checked = run_checks(health_check_services, timeout=settings.PINGDOM_CHECK_TIMEOUT)
+                cls.cache = (time.monotonic(), checked)
+            return cls.cache[1]
+
     @method_decorator(never_cache)
     def get(self, *args, **kwargs):
 
-        checked = {}
-        for service in health_check_services:
-            checked[service.name] = service().check()
+        checked = self.get_checked()
+        checks = [
+            {
+                'name': name,
+                'status': 'OK' if item[HEALTH_CHECK_STATUS] else 'FALSE',
+                'response_time': round(item[HEALTH_CHECK_LATENCY] * 1000, 3),
+            }
+            for name, item in checked.items()
+        ]
+        context = {
+            'checks': checks,
+            'response_time': max([check['response_time'] for check in checks], default=0),
+        }
 
         if all(item[HEALTH_CHECK_STATUS] for item in checked.values()):
             return HttpResponse(
-                render_to_string(self.template_name, {'status': self.status, 'errors': []}),
+                render_to_string(self.template_name, {**context, 'status': self.status, 'errors': []}),
                 status=200,
                 content_type='text/xml',
             )
@@ -34,7 +64,25 @@ class PingDomView(TemplateView):
             for service_result in filter(lambda x: x[HEALTH_CHECK_STATUS] is False, checked.values()):
                 errors.append(service_result[HEALTH_CHECK_EXCEPTION])
             return HttpResponse(
-                render_to_string(self.template_name, {'status': self.status, 'errors': errors}),
+                render_to_string(self.template_name, {**context, 'status': self.status, 'errors': errors}),
                 status=500,
                 content_type='text/xml',
             )
+
+
+class MetricsView(View):
+    """
+    Outbound call, middleware and connection pool metrics in the prometheus
+    text format. The metrics are per process: each scrape reports the worker
+    that served it.
+
+    """
+
+    def has_permission(self):
+        return constant_time_compare(self.request.GET.get('token'), settings.METRICS_TOKEN)
+
+    @method_decorator(never_cache)
+    def get(self, *args, **kwargs):
+        if not self.has_permission():
+            return HttpResponseForbidden()
+        return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,69 @@
+import json
+import secrets
+
+from formtools.wizard.storage.base import BaseStorage
+
+from django.conf import settings
+from django.core.cache import caches
+
+from core.cache import hash_key
+
+
+class CacheStorage(BaseStorage):
+    """
+    Wizard storage that keeps the step data in the cache, which is redis
+    when deployed, rather than in the signed cookie session. The cookie only
+    holds a random key for the data. The data expires WIZARD_STORAGE_TIMEOUT
+    seconds after the last step was submitted.
+
+    """
+
+    # short names keep the serialized data compact
+    step_key = 's'
+    step_data_key = 'd'
+    step_files_key = 'f'
+    extra_data_key = 'e'
+
+    encoder = json.JSONEncoder(separators=(',', ':'))
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache = caches[settings.WIZARD_STORAGE_CACHE]
+        self.key = self.request.COOKIES.get(self.prefix)
+        self.loaded = self.load_data() if self.key else None
+        if self.loaded is None:
+            self.init_data()
+        else:
+            self.data = json.loads(self.loaded)
+
+    @property
+    def cache_key(self):
+        return hash_key(self.prefix, self.key)
+
+    def load_data(self):
+        return self.cache.get(self.cache_key)
+
+    def is_empty(self):
+        return not any(self.data.values())
+
+    def update_response(self, response):
+        super().update_response(response)
+        if self.is_empty():
+            if self.key:
+                self.cache.delete(self.cache_key)
+                response.delete_cookie(self.prefix)
+            return
+        serialized = self.encoder.encode(self.data)
+        if serialized == self.loaded:
+            return
+        if not self.key:
+            self.key = secrets.token_urlsafe(16)
+        self.cache.set(self.cache_key, serialized, timeout=settings.WIZARD_STORAGE_TIMEOUT)
+        response.set_cookie(
+            self.prefix,
+            self.key,
+            max_age=settings.WIZARD_STORAGE_TIMEOUT,
+            secure=settings.SESSION_COOKIE_SECURE,
+            httponly=True,
+            samesite='Lax',
+        )
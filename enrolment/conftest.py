@@ -5,6 +5,8 @@ from directory_api_client.client import api_client
 import requests
 import pytest
 
+from enrolment.helpers import CompaniesHouseClient
+
 
 @pytest.fixture
 def api_response_200():
@@ -23,3 +25,9 @@ def company_unique_api_response(api_response_200):
     stub.start()
     yield
     stub.stop()
+
+
+@pytest.fixture(autouse=True)
+def reset_circuit_breakers():
+    yield
+    CompaniesHouseClient.circuit_breakers.reset()
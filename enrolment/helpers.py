@@ -1,8 +1,9 @@
 from collections import OrderedDict
 from functools import partial
 import logging
+import re
 import urllib
-from urllib.parse import urljoin
+from urllib.parse import urljoin, urlparse
 
 from django.conf import settings
 
@@ -10,6 +11,9 @@ import requests
 
 from directory_api_client.client import api_client
 
+from core.instrumentation import record_outbound_call, register_outbound_method
+from enrolment import transport
+
 
 MESSAGE_AUTH_FAILED = 'Auth failed with Companies House'
 
@@ -43,15 +47,51 @@ class CompaniesHouseClient:
         'oauth2': make_oauth2_url('oauth2/authorise'),
         'oauth2-token': make_oauth2_url('oauth2/token'),
     }
-    session = requests.Session()
+    sessions = transport.ThreadLocalSessions(
+        factory=partial(
+            transport.build_session,
+            pool_maxsize=settings.COMPANIES_HOUSE_POOL_MAXSIZE,
+            retries=settings.COMPANIES_HOUSE_RETRIES,
+            backoff_factor=settings.COMPANIES_HOUSE_RETRY_BACKOFF_FACTOR,
+        )
+    )
+    timeout = (
+        settings.COMPANIES_HOUSE_CONNECT_TIMEOUT,
+        settings.COMPANIES_HOUSE_READ_TIMEOUT,
+    )
+    circuit_breakers = transport.CircuitBreakers(
+        failure_threshold=settings.COMPANIES_HOUSE_CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+        reset_timeout=settings.COMPANIES_HOUSE_CIRCUIT_BREAKER_RESET_TIMEOUT,
+    )
 
     @classmethod
     def get_auth(cls):
         return requests.auth.HTTPBasicAuth(cls.api_key, '')
 
+    @classmethod
+    def get_pool_metrics(cls):
+        return cls.sessions.get_pool_metrics()
+
+    @classmethod
+    def get_endpoint_name(cls, url):
+        path = urlparse(url).path
+        for name, endpoint in cls.endpoints.items():
+            pattern = re.escape(urlparse(endpoint).path).replace(re.escape('{number}'), '[^/]+')
+            if re.fullmatch(pattern, path):
+                return name
+        return path
+
+    @classmethod
+    def send(cls, endpoint_name, send):
+        # requests refused by an open circuit are recorded as errors too
+        return record_outbound_call('companies-house', endpoint_name)(cls.circuit_breakers[endpoint_name].call)(send)
+
     @classmethod
     def get(cls, url, params={}):
-        response = cls.session.get(url=url, params=params, auth=cls.get_auth())
+        response = cls.send(
+            endpoint_name=cls.get_endpoint_name(url),
+            send=lambda: cls.sessions.session.get(url=url, params=params, auth=cls.get_auth(), timeout=cls.timeout),
+        )
         if response.status_code == 403:
             logger.error(MESSAGE_AUTH_FAILED)
         return response
@@ -77,4 +117,12 @@ class CompaniesHouseClient:
             ('client_secret', cls.client_secret),
             ('redirect_uri', redirect_uri),
         ])
-        return cls.session.post(url=url + '?' + urllib.parse.urlencode(params))
+        return cls.send(
+            endpoint_name='oauth2-token',
+            send=lambda: cls.sessions.session.post(
+                url=url + '?' + urllib.parse.urlencode(params), timeout=cls.timeout
+            ),
+        )
+
+
+register_outbound_method(CompaniesHouseClient, 'verify_oauth2_code', 'companies-house', 'oauth2-token')
@@ -1,11 +1,12 @@
 import http
 from unittest.mock import patch
 
+import pytest
 from requests import Response
 import requests_mock
 
 
-from enrolment import helpers
+from enrolment import helpers, transport
 
 
 def profile_api_404(*args, **kwargs):
@@ -61,3 +62,37 @@ def test_verify_oauth2_code():
         '&client_secret=debug'
         '&redirect_uri=http%3A%2F%2Fredirect.com'
     )
+
+
+def test_companies_house_client_timeout(requests_mock):
+    requests_mock.get('https://thing.com')
+
+    helpers.CompaniesHouseClient.get('https://thing.com')
+
+    assert requests_mock.last_request.timeout == (3.05, 10)
+
+
+def test_companies_house_client_circuit_breaker(requests_mock, settings):
+    url = 'https://api.companieshouse.gov.uk/company/123/'
+    requests_mock.get(url, status_code=503)
+
+    for _ in range(settings.COMPANIES_HOUSE_CIRCUIT_BREAKER_FAILURE_THRESHOLD):
+        helpers.CompaniesHouseClient.get(url)
+
+    with pytest.raises(transport.CircuitBreakerOpen):
+        helpers.CompaniesHouseClient.get(url)
+    # other endpoints are unaffected
+    requests_mock.get('https://api.companieshouse.gov.uk/search/companies')
+    helpers.CompaniesHouseClient.get('https://api.companieshouse.gov.uk/search/companies')
+
+    assert requests_mock.call_count == settings.COMPANIES_HOUSE_CIRCUIT_BREAKER_FAILURE_THRESHOLD + 1
+
+
+def test_companies_house_client_endpoint_name():
+    client = helpers.CompaniesHouseClient
+
+    assert client.get_endpoint_name('https://api.companieshouse.gov.uk/company/123') == 'profile'
+    assert client.get_endpoint_name(
+        'https://api.companieshouse.gov.uk/company/123/registered-office-address'
+    ) == 'address'
+    assert client.get_endpoint_name('https://thing.com/other') == '/other'
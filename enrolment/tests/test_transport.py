@@ -0,0 +1,170 @@
+import os
+import threading
+from unittest import mock
+
+import pytest
+import requests
+
+from enrolment import transport
+from core.tests.helpers import create_response
+
+
+@pytest.fixture
+def breaker():
+    return transport.CircuitBreaker(name='profile', failure_threshold=2, reset_timeout=30)
+
+
+def test_circuit_breaker_opens_after_threshold(breaker):
+    send = mock.Mock(return_value=create_response(503))
+
+    breaker.call(send)
+    breaker.call(send)
+
+    with pytest.raises(transport.CircuitBreakerOpen):
+        breaker.call(send)
+    assert send.call_count == 2
+
+
+def test_circuit_breaker_counts_connection_errors(breaker):
+    send = mock.Mock(side_effect=requests.exceptions.ConnectTimeout)
+
+    for _ in range(2):
+        with pytest.raises(requests.exceptions.ConnectTimeout):
+            breaker.call(send)
+
+    assert breaker.state == breaker.OPEN
+
+
+@mock.patch('time.monotonic')
+def test_circuit_breaker_half_open_unexpected_exception(mock_monotonic, breaker):
+    mock_monotonic.return_value = 100
+    for _ in range(2):
+        breaker.call(mock.Mock(return_value=create_response(503)))
+
+    mock_monotonic.return_value = 130
+    with pytest.raises(ValueError):
+        breaker.call(mock.Mock(side_effect=ValueError))
+    assert breaker.state == breaker.OPEN
+
+    # the trial failed, so another is let through after the reset timeout
+    mock_monotonic.return_value = 160
+    breaker.call(mock.Mock(return_value=create_response(200)))
+    assert breaker.state == breaker.CLOSED
+
+
+def test_circuit_breaker_success_resets_failures(breaker):
+    breaker.call(mock.Mock(return_value=create_response(503)))
+    breaker.call(mock.Mock(return_value=create_response(404)))
+    breaker.call(mock.Mock(return_value=create_response(503)))
+
+    assert breaker.state == breaker.CLOSED
+
+
+@mock.patch('time.monotonic')
+def test_circuit_breaker_half_open(mock_monotonic, breaker):
+    mock_monotonic.return_value = 100
+    for _ in range(2):
+        breaker.call(mock.Mock(return_value=create_response(503)))
+
+    mock_monotonic.return_value = 130
+    assert breaker.allow_request() is True
+    # only one trial request is let through
+    assert breaker.allow_request() is False
+
+    breaker.record_failure()
+    assert breaker.state == breaker.OPEN
+
+    mock_monotonic.return_value = 160
+    breaker.call(mock.Mock(return_value=create_response(200)))
+    assert breaker.state == breaker.CLOSED
+
+
+def test_circuit_breakers_per_name():
+    breakers = transport.CircuitBreakers(failure_threshold=1, reset_timeout=30)
+
+    assert breakers['profile'] is breakers['profile']
+    assert breakers['profile'] is not breakers['search']
+
+
+@mock.patch('random.uniform', lambda low, high: high)
+def test_jittered_retry_backoff():
+    retry = transport.JitteredRetry(total=5, backoff_factor=1)
+    for _ in range(3):
+        retry = retry.increment(method='GET', url='/', error=requests.exceptions.ConnectionError())
+
+    assert retry.get_backoff_time() == 4
+
+
+def test_build_session():
+    session = transport.build_session(pool_maxsize=3, retries=2, backoff_factor=0.5)
+    adapter = session.get_adapter('https://api.companieshouse.gov.uk')
+
+    assert adapter._pool_maxsize == 3
+    assert adapter.max_retries.total == 2
+    assert adapter.max_retries.allowed_methods == frozenset(['GET'])
+    assert isinstance(adapter.max_retries, transport.JitteredRetry)
+
+
+@pytest.fixture
+def sessions():
+    return transport.ThreadLocalSessions(
+        factory=lambda: transport.build_session(pool_maxsize=2, retries=0, backoff_factor=0)
+    )
+
+
+def test_thread_local_sessions_per_thread(sessions):
+    other_thread_sessions = []
+    thread = threading.Thread(target=lambda: other_thread_sessions.append(sessions.session))
+    thread.start()
+    thread.join()
+
+    assert sessions.session is sessions.session
+    assert other_thread_sessions[0] is not sessions.session
+
+
+def test_thread_local_sessions_recreated_after_fork(sessions):
+    parent_session = sessions.session
+    read_fd, write_fd = os.pipe()
+
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        os.write(write_fd, b'1' if sessions.session is not parent_session else b'0')
+        os._exit(0)
+    os.close(write_fd)
+    os.waitpid(pid, 0)
+
+    assert os.read(read_fd, 1) == b'1'
+    assert sessions.session is parent_session
+
+
+def test_thread_local_sessions_pid_changed(sessions):
+    parent_session = sessions.session
+
+    with mock.patch('os.getpid', return_value=-1):
+        assert sessions.session is not parent_session
+        assert sessions.get_pool_metrics()['sessions'] == 1
+
+
+def test_thread_local_sessions_pool_metrics(sessions):
+    assert sessions.get_pool_metrics()['pools'] == {}
+
+    session = sessions.session
+    pool = session.get_adapter('https://api.companieshouse.gov.uk').poolmanager.connection_from_url(
+        'https://api.companieshouse.gov.uk'
+    )
+    pool.num_requests = 3
+    pool.num_connections = 1
+
+    metrics = sessions.get_pool_metrics()
+
+    assert metrics['pid'] == os.getpid()
+    assert metrics['sessions'] == 1
+    assert metrics['pools'] == {
+        'api.companieshouse.gov.uk': {
+            'connections_opened': 1,
+            'requests': 3,
+            'pool_available': 2,
+            'pool_maxsize': 2,
+        }
+    }
@@ -0,0 +1,212 @@
+import os
+import random
+import threading
+import time
+import weakref
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from core.cache import reset_after_fork
+
+
+MESSAGE_CIRCUIT_OPEN = 'Circuit open for {name}: not sending request'
+
+
+class CircuitBreakerOpen(requests.exceptions.ConnectionError):
+    pass
+
+
+class JitteredRetry(Retry):
+    """
+    Spread retries out so workers that failed together do not all retry at
+    the same instant.
+
+    """
+
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        return backoff / 2 + random.uniform(0, backoff / 2)
+
+
+class CircuitBreaker:
+    """
+    Fail fast while an upstream endpoint is degraded.
+
+    After `failure_threshold` consecutive failures the circuit opens and
+    requests are refused without being sent. Once `reset_timeout` seconds
+    have passed a single trial request is let through: success closes the
+    circuit, failure opens it again.
+
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, name, failure_threshold, reset_timeout):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failure_count = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def allow_request(self):
+        with self.lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.state = self.CLOSED
+            self.failure_count = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failure_count += 1
+            if self.state == self.HALF_OPEN or self.failure_count >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def call(self, send):
+        """
+        Send the request via `send` unless the circuit is open. Any
+        exception, e.g., a connection error or timeout, and 5xx responses
+        count as failures, so a trial request always settles the circuit.
+
+        @param {callable} send - takes no arguments, returns requests.Response
+        @returns requests.Response
+
+        """
+
+        if not self.allow_request():
+            raise CircuitBreakerOpen(MESSAGE_CIRCUIT_OPEN.format(name=self.name))
+        try:
+            response = send()
+        except Exception:
+            self.record_failure()
+            raise
+        if response.status_code >= 500:
+            self.record_failure()
+        else:
+            self.record_success()
+        return response
+
+
+class CircuitBreakers:
+    """One circuit breaker per endpoint name, created on first use."""
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.breakers = {}
+        self.lock = threading.Lock()
+
+    def __getitem__(self, name):
+        with self.lock:
+            if name not in self.breakers:
+                self.breakers[name] = CircuitBreaker(
+                    name=name,
+                    failure_threshold=self.failure_threshold,
+                    reset_timeout=self.reset_timeout,
+                )
+            return self.breakers[name]
+
+    def reset(self):
+        with self.lock:
+            self.breakers.clear()
+
+
+def build_session(pool_maxsize, retries, backoff_factor):
+    """
+    Session with a bounded connection pool that retries idempotent GETs on
+    connection errors and 502/503/504 responses.
+
+    Requests over the pool size are not queued: the extra connection is
+    opened and then discarded, so a busy pool never blocks a worker.
+
+    """
+
+    retry = JitteredRetry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        allowed_methods=frozenset(['GET']),
+        status_forcelist=(502, 503, 504),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize, max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+class ThreadLocalSessions:
+    """
+    One session per thread, discarded in forked children.
+
+    A `requests.Session` and its pooled sockets must not be shared between
+    threads, or between a parent process and the workers it forks (e.g.,
+    gunicorn --preload). Sessions are created lazily by `factory` the first
+    time each thread asks for one.
+
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.reset()
+        reset_after_fork(self.reset)
+
+    def reset(self):
+        # the parent's sockets are left for the parent to close
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.sessions = weakref.WeakSet()
+
+    @property
+    def session(self):
+        if self.pid != os.getpid():
+            self.reset()
+        session = getattr(self.local, 'session', None)
+        if session is None:
+            session = self.local.session = self.factory()
+            with self.lock:
+                self.sessions.add(session)
+        return session
+
+    def get_pool_metrics(self):
+        """
+        @returns dict - connection pool usage of every session in this
+                        process, keyed by host
+
+        """
+
+        with self.lock:
+            sessions = list(self.sessions)
+        pools = {}
+        for session in sessions:
+            for adapter in set(session.adapters.values()):
+                for key in adapter.poolmanager.pools.keys():
+                    pool = adapter.poolmanager.pools.get(key)
+                    if pool is None:
+                        continue
+                    metrics = pools.setdefault(pool.host, {
+                        'connections_opened': 0,
+                        'requests': 0,
+                        'pool_available': 0,
+                        'pool_maxsize': 0,
+                    })
+                    metrics['connections_opened'] += pool.num_connections
+                    metrics['requests'] += pool.num_requests
+                    metrics['pool_available'] += pool.pool.qsize() if pool.pool else 0
+                    metrics['pool_maxsize'] += pool.pool.maxsize if pool.pool else 0
+        return {'pid': self.pid, 'sessions': len(sessions), 'pools': pools}
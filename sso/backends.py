@@ -0,0 +1,44 @@
+from directory_sso_api_client.backends import SSOUserBackend
+
+from django.contrib import auth
+
+from core.cache import TieredCache
+from core.instrumentation import sso_session_lookups
+
+
+class SessionUserCache(TieredCache):
+    """
+    The SSO session-user lookups of recent sessions, keyed by session id.
+
+    """
+
+    key_prefix = 'sso-session-user'
+    timeout_setting = 'SSO_SESSION_CACHE_TIMEOUT'
+    maxsize_setting = 'SSO_SESSION_CACHE_MAXSIZE'
+    l2_setting = 'SSO_SESSION_CACHE_L2'
+    lookups = sso_session_lookups
+
+
+session_user_cache = SessionUserCache()
+
+
+class CachedSSOUserBackend(SSOUserBackend):
+    """
+    SSOUserBackend that reuses recent session-user lookups, so the requests
+    of a page load or a form POST and its redirect resolve the session once.
+
+    Only successful lookups are cached. A session ended at SSO is still
+    accepted here until its entry expires.
+
+    """
+
+    def get_user(self, session_id):
+        parsed = session_user_cache.get(session_id)
+        if parsed is None:
+            return super().get_user(session_id)
+        SSOUser = auth.get_user_model()
+        return SSOUser(**self.user_kwargs(session_id=session_id, parsed=parsed))
+
+    def build_user(self, session_id, response):
+        session_user_cache.set(session_id, response.json())
+        return super().build_user(session_id=session_id, response=response)
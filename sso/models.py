@@ -1,13 +1,35 @@
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import time
+
 from directory_api_client import api_client
 import directory_sso_api_client.models
 
+from django.conf import settings
+from django.core.cache import caches
 from django.utils.functional import cached_property
 
+from core.cache import hash_key
+
+
+logger = logging.getLogger(__name__)
+
 
 class SSOUser(directory_sso_api_client.models.SSOUser):
 
-    @cached_property
-    def company(self):
+    profile_names = ('company', 'supplier')
+
+    @property
+    def company_cache_key(self):
+        return hash_key('sso-company-profile', self.session_id)
+
+    def retrieve_company(self):
+        cache = caches['default']
+        version = settings.COMPANY_PROFILE_CACHE_VERSION
+        parsed = cache.get(self.company_cache_key, version=version)
+        if parsed is not None:
+            return parsed
+
         response = api_client.company.profile_retrieve(self.session_id)
         if response.status_code == 404:
             return {}
@@ -16,12 +38,67 @@ class SSOUser(directory_sso_api_client.models.SSOUser):
 
         if parsed.get('sectors'):
             parsed['sectors'] = parsed['sectors'][0]
+        cache.set(
+            self.company_cache_key,
+            parsed,
+            timeout=settings.COMPANY_PROFILE_CACHE_TIMEOUT,
+            version=version,
+        )
         return parsed
 
-    @cached_property
-    def supplier(self):
+    def invalidate_company(self):
+        """
+        Discard the cached company profile. Call after anything that changes
+        the profile upstream so the next read sees the new state.
+
+        """
+
+        caches['default'].delete(self.company_cache_key, version=settings.COMPANY_PROFILE_CACHE_VERSION)
+        self.__dict__.pop('company', None)
+
+    def retrieve_supplier(self):
         response = api_client.supplier.retrieve_profile(self.session_id)
         if response.status_code == 404:
             return {}
         response.raise_for_status()
         return response.json()
+
+    @cached_property
+    def company(self):
+        return self.retrieve_company()
+
+    @cached_property
+    def supplier(self):
+        return self.retrieve_supplier()
+
+    def load_profiles(self, names=profile_names):
+        """
+        Retrieve the company and supplier profiles at the same time, rather
+        than one after the other when each cached property is first read.
+
+        Profiles that are already cached are not retrieved again.
+
+        @param {iterable} names - the profiles to retrieve
+        @returns dict - seconds each retrieval took, keyed by profile name
+
+        """
+
+        names = [name for name in names if name not in self.__dict__]
+        if not names:
+            return {}
+
+        def timed(name):
+            start_time = time.monotonic()
+            try:
+                return getattr(self, f'retrieve_{name}')()
+            finally:
+                timings[name] = time.monotonic() - start_time
+
+        timings = {}
+        with ThreadPoolExecutor(max_workers=len(names)) as executor:
+            futures = {name: executor.submit(timed, name) for name in names}
+        for name, future in futures.items():
+            self.__dict__[name] = future.result()
+
+        logger.debug('Profiles retrieved in %s', timings)
+        return timings
@@ -0,0 +1,104 @@
+from unittest import mock
+
+import pytest
+
+from core import instrumentation
+from core.tests.helpers import create_response
+from sso.backends import CachedSSOUserBackend
+
+
+@pytest.fixture(autouse=True)
+def sso_session_lookups():
+    instrumentation.sso_session_lookups.reset()
+    yield instrumentation.sso_session_lookups
+    instrumentation.sso_session_lookups.reset()
+
+
+@pytest.fixture
+def session_user_response(auth_backend):
+    auth_backend.return_value = create_response(200, {'id': 1, 'email': 'jim@example.com', 'hashed_uuid': '987'})
+    return auth_backend
+
+
+def test_cached_backend_reuses_lookup(session_user_response, sso_session_lookups):
+    backend = CachedSSOUserBackend()
+
+    first = backend.get_user('123')
+    second = backend.get_user('123')
+
+    assert session_user_response.call_count == 1
+    assert first is not second
+    assert second.session_id == '123'
+    assert second.email == 'jim@example.com'
+    assert sso_session_lookups.snapshot() == {('miss',): 1, ('l1_hit',): 1}
+
+
+def test_cached_backend_separate_sessions(session_user_response):
+    backend = CachedSSOUserBackend()
+
+    backend.get_user('123')
+    backend.get_user('456')
+
+    assert session_user_response.call_count == 2
+
+
+def test_cached_backend_failure_not_cached(auth_backend):
+    backend = CachedSSOUserBackend()
+
+    assert backend.get_user('123') is None
+    assert backend.get_user('123') is None
+    assert auth_backend.call_count == 2
+
+
+def test_cached_backend_expires(session_user_response, settings):
+    backend = CachedSSOUserBackend()
+
+    with mock.patch('time.monotonic', return_value=100):
+        backend.get_user('123')
+    with mock.patch('time.monotonic', return_value=100 + settings.SSO_SESSION_CACHE_TIMEOUT):
+        backend.get_user('123')
+
+    assert session_user_response.call_count == 2
+
+
+def test_cached_backend_disabled(session_user_response, settings):
+    settings.SSO_SESSION_CACHE_TIMEOUT = 0
+    backend = CachedSSOUserBackend()
+
+    backend.get_user('123')
+    backend.get_user('123')
+
+    assert session_user_response.call_count == 2
+
+
+def test_cached_backend_lru_bounded(session_user_response, settings, session_user_cache):
+    settings.SSO_SESSION_CACHE_MAXSIZE = 2
+    backend = CachedSSOUserBackend()
+
+    for session_id in ['1', '2', '1', '3']:
+        backend.get_user(session_id)
+
+    assert list(session_user_cache.entries) == ['1', '3']
+
+
+def test_cached_backend_l2(session_user_response, settings, session_user_cache, sso_session_lookups):
+    settings.SSO_SESSION_CACHE_L2 = 'default'
+    backend = CachedSSOUserBackend()
+
+    backend.get_user('123')
+    # e.g., another process
+    session_user_cache.clear()
+    user = backend.get_user('123')
+
+    assert session_user_response.call_count == 1
+    assert user.email == 'jim@example.com'
+    assert sso_session_lookups.snapshot() == {('miss',): 1, ('l2_hit',): 1}
+
+
+def test_cached_backend_page_load(client, user, session_user_response):
+    client.force_login(user)
+
+    client.get('/find-a-buyer/confirm-company-address/')
+    client.get('/find-a-buyer/confirm-company-address/')
+
+    assert session_user_response.call_count == 1
@@ -0,0 +1,80 @@
+from unittest import mock
+
+from directory_api_client import api_client
+
+from django.contrib.auth import get_user_model
+
+from core.tests.helpers import create_response
+
+
+@mock.patch.object(api_client.supplier, 'retrieve_profile')
+@mock.patch.object(api_client.company, 'profile_retrieve')
+def test_load_profiles(mock_profile_retrieve, mock_retrieve_profile, user):
+    mock_profile_retrieve.return_value = create_response(200, {'name': 'Great company', 'sectors': ['SECURITY']})
+    mock_retrieve_profile.return_value = create_response(200, {'is_company_owner': True})
+
+    timings = user.load_profiles()
+
+    assert sorted(timings) == ['company', 'supplier']
+    assert user.company == {'name': 'Great company', 'sectors': 'SECURITY'}
+    assert user.supplier == {'is_company_owner': True}
+    mock_profile_retrieve.assert_called_once_with('123')
+    mock_retrieve_profile.assert_called_once_with('123')
+
+
+@mock.patch.object(api_client.supplier, 'retrieve_profile', return_value=create_response(404))
+@mock.patch.object(api_client.company, 'profile_retrieve')
+def test_load_profiles_skips_cached(mock_profile_retrieve, mock_retrieve_profile, user):
+    user.company = {'name': 'Great company'}
+
+    timings = user.load_profiles()
+
+    assert list(timings) == ['supplier']
+    assert user.supplier == {}
+    assert mock_profile_retrieve.call_count == 0
+    assert user.load_profiles() == {}
+
+
+@mock.patch.object(api_client.company, 'profile_retrieve')
+def test_company_shared_between_requests(mock_profile_retrieve, user):
+    mock_profile_retrieve.return_value = create_response(200, {'name': 'Great company'})
+    other_request_user = get_user_model()(id=1, session_id=user.session_id)
+
+    assert user.company == {'name': 'Great company'}
+    assert other_request_user.company == {'name': 'Great company'}
+    assert mock_profile_retrieve.call_count == 1
+
+
+@mock.patch.object(api_client.company, 'profile_retrieve')
+def test_company_not_found_not_cached(mock_profile_retrieve, user):
+    mock_profile_retrieve.return_value = create_response(404)
+    other_request_user = get_user_model()(id=1, session_id=user.session_id)
+
+    assert user.company == {}
+    assert other_request_user.company == {}
+    assert mock_profile_retrieve.call_count == 2
+
+
+@mock.patch.object(api_client.company, 'profile_retrieve')
+def test_company_invalidate(mock_profile_retrieve, user):
+    mock_profile_retrieve.return_value = create_response(200, {'is_verified': False})
+    assert user.company == {'is_verified': False}
+
+    mock_profile_retrieve.return_value = create_response(200, {'is_verified': True})
+    user.invalidate_company()
+
+    assert user.company == {'is_verified': True}
+    assert get_user_model()(id=1, session_id=user.session_id).company == {'is_verified': True}
+    assert mock_profile_retrieve.call_count == 2
+
+
+@mock.patch.object(api_client.company, 'profile_retrieve')
+def test_company_cache_key_versioned(mock_profile_retrieve, user, settings):
+    mock_profile_retrieve.return_value = create_response(200, {'name': 'Great company'})
+    user.retrieve_company()
+
+    settings.COMPANY_PROFILE_CACHE_VERSION += 1
+    user.retrieve_company()
+
+    assert mock_profile_retrieve.call_count == 2
+    assert user.session_id not in user.company_cache_key